@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import weakref
+from typing import AsyncIterator, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from amazon_scrapper.scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Responses that mean we are going too fast and slow the host's scheduler down
+THROTTLE_STATUSES = {429, 503}
+
+# Keyword arguments for the Fetcher created per event loop by get_fetcher(), see configure_fetcher()
+FETCHER_OPTIONS: Dict = {}
+
+
+class Fetcher:
+    """
+    Async HTTP fetcher with a shared connection pool, per-host concurrency
+    limits, timeouts and retry with exponential backoff. Request pacing and
+    header rotation come from the process-wide AdaptiveScheduler of each host.
+
+    Args:
+        max_connections (int): Size of the shared connection pool
+        per_host (int): Maximum concurrent requests to a single host
+        timeout (float): Per-request timeout in seconds
+        retries (int): Retries after the first attempt
+        backoff (float): Initial backoff in seconds, doubled on every retry
+        headers (Dict): Default request headers
+        transport (httpx.AsyncBaseTransport): Custom transport, e.g. to replay recorded responses
+    """
+
+    def __init__(self, max_connections: int = 20, per_host: int = 4, timeout: float = 10.0,
+                 retries: int = 3, backoff: float = 0.5, headers: Optional[Dict] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = headers or DEFAULT_HEADERS
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                follow_redirects=True,
+                transport=self.transport,
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def get(self, url: str, params: Optional[Dict] = None) -> httpx.Response:
+        """GET a URL, retrying transport errors and retryable status codes with backoff."""
+        client = self._get_client()
+        scheduler = get_scheduler(urlsplit(url).netloc)
+        async with self._host_limit(url):
+            for attempt in range(self.retries + 1):
+                await scheduler.acquire()
+                try:
+                    response = await client.get(url, params=params, headers=scheduler.headers())
+                    if response.status_code in THROTTLE_STATUSES:
+                        scheduler.report("throttled")
+                    if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                        await asyncio.sleep(self.backoff * 2 ** attempt)
+                        continue
+                    response.raise_for_status()
+                    return response
+                except httpx.TransportError:
+                    if attempt == self.retries:
+                        raise
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def warm(self, url: str):
+        """Open a pooled connection to the host of url ahead of the first real request; failures are ignored."""
+        parts = urlsplit(url)
+        try:
+            await self._get_client().head(f"{parts.scheme}://{parts.netloc}/")
+        except httpx.HTTPError as e:
+            logger.debug("Warm-up request to %s failed: %s", parts.netloc, e)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# A single background event loop owns the shared fetcher, so sync callers reuse
+# its connection pool across calls instead of opening a new one per asyncio.run.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_fetchers = weakref.WeakKeyDictionary()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="fetcher-loop", daemon=True).start()
+    return _loop
+
+
+def get_fetcher() -> Fetcher:
+    """Return the shared fetcher of the running event loop (clients can't cross loops)."""
+    loop = asyncio.get_running_loop()
+    if loop not in _fetchers:
+        _fetchers[loop] = Fetcher(**FETCHER_OPTIONS)
+    return _fetchers[loop]
+
+
+def configure_fetcher(**options):
+    """Set Fetcher options (e.g. per_host) for shared fetchers, replacing any already created."""
+    FETCHER_OPTIONS.update(options)
+    _fetchers.clear()
+
+
+async def _in_context(coro, context: contextvars.Context):
+    # Carry the caller's context variables (e.g. the current trace span) onto the loop thread
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared fetcher loop and block until it finishes."""
+    context = contextvars.copy_context()
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, context), _background_loop()).result()
+
+
+def iter_sync(iterator: AsyncIterator) -> Iterator:
+    """
+    Drive an async iterator on the shared fetcher loop and yield its items in
+    the calling thread as they are produced, so the caller can work on early
+    items while the loop keeps fetching. The loop starts on it right away,
+    before the first item is asked for; closing the generator cancels it.
+    """
+    items: queue.Queue = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in iterator:
+                items.put((item, None))
+        except Exception as e:
+            items.put((None, e))
+        finally:
+            items.put((done, None))
+
+    context = contextvars.copy_context()
+    future = asyncio.run_coroutine_threadsafe(_in_context(pump(), context), _background_loop())
+
+    def drain():
+        try:
+            while True:
+                item, error = items.get()
+                if error is not None:
+                    raise error
+                if item is done:
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    return drain()
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from amazon_scrapper.fetcher import Fetcher, get_fetcher
+from amazon_scrapper.scheduler import get_scheduler
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Times a captcha'd page is fetched again, after the scheduler's cooldown and with another header profile
+CAPTCHA_RETRIES = 2
+
+
+class MarketplaceUnavailable(RuntimeError):
+    """Raised when none of a search's result pages could be fetched, e.g. every one was a captcha."""
+
+
+class Marketplace(ABC):
+    """
+    A shopping site the search tool fans queries out to.
+
+    A plugin supplies the search request for a query and price range, a parser
+    for its result pages and the unit its prices are listed in. Fetching,
+    captcha retries, pacing through the host's AdaptiveScheduler and price
+    conversion are shared. Prices outside the plugin are always in INR.
+
+    Attributes:
+        name (str): Short name used in SHOPPIN_MARKETPLACES and in metrics
+        base_url (str): Search endpoint
+        price_unit (float): INR per unit of the listed prices
+    """
+
+    name: str
+    base_url: str
+    price_unit: float = 1.0
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.base_url).netloc
+
+    @abstractmethod
+    def search_params(self, search_query: str, min_price, max_price, page: int = 1) -> Dict:
+        """Query string for one results page, with the price range in the listed unit."""
+
+    @abstractmethod
+    def parse(self, html, n: int = 20) -> Iterator[Dict]:
+        """Yield up to n products in the parser's dict format from a results page, prices in the listed unit."""
+
+    def is_blocked(self, html) -> bool:
+        """True when a page is a captcha or bot wall instead of results."""
+        return False
+
+    def _listed_price(self, price):
+        return None if price is None else price / self.price_unit
+
+    async def fetch_page(self, fetcher: Fetcher, search_query: str, min_price, max_price,
+                         page: int = 1) -> Optional[bytes]:
+        """Fetch one results page, or None when the site keeps answering with a captcha."""
+        params = self.search_params(search_query, self._listed_price(min_price), self._listed_price(max_price), page)
+        scheduler = get_scheduler(self.host)
+        logger.debug("Making request to %s with params: %s", self.name, params)
+        for attempt in range(CAPTCHA_RETRIES + 1):
+            with span("fetch", marketplace=self.name, page=page, attempt=attempt) as fetch_span:
+                response = await fetcher.get(self.base_url, params=params)
+                fetch_span.set(status=response.status_code, bytes=len(response.content))
+
+            # Debug information
+            logger.debug("Response status code: %s", response.status_code)
+            logger.debug("URL after redirection: %s", response.url)
+
+            # Check if we're being blocked or redirected to a captcha
+            if not self.is_blocked(response.content):
+                return response.content
+            scheduler.report("captcha")
+            logger.warning("%s is showing a captcha page for page %s (attempt %s), backing off.",
+                           self.name, page, attempt + 1)
+        return None
+
+    async def stream(self, search_query: str, min_price, max_price, n: int = 20, pages: int = 1,
+                     fetcher: Optional[Fetcher] = None) -> AsyncIterator[Dict]:
+        """
+        Fetch result pages 1..pages concurrently and yield products priced in INR,
+        in completion order, dropping repeated ASINs. Each page contributes at
+        most ceil(n / pages) products, so every page is consumed rather than the
+        first one to arrive filling the quota.
+
+        Raises:
+            MarketplaceUnavailable: No page was fetched, so the search found nothing rather than no products
+        """
+        fetcher = fetcher or get_fetcher()
+        scheduler = get_scheduler(self.host)
+
+        async def fetch(page):
+            return await self.fetch_page(fetcher, search_query, min_price, max_price, page)
+
+        tasks = [asyncio.create_task(fetch(page)) for page in range(1, pages + 1)]
+        per_page = -(-n // pages)
+        seen = set()
+        fetched = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    content = await next_done
+                except httpx.HTTPError as e:
+                    logger.warning("Error making request to %s: %s", self.name, e)
+                    continue
+                if content is None:
+                    continue
+                fetched += 1
+
+                parsed = 0
+                for product in self.parse(content, n=per_page):
+                    parsed += 1
+                    if product['asin'] != 'N/A':
+                        if product['asin'] in seen:
+                            continue
+                        seen.add(product['asin'])
+                    if self.price_unit != 1:
+                        product['price'] = int(round(product['price'] * self.price_unit))
+                        product['currency'] = '₹'
+                    yield product
+                scheduler.report("ok" if parsed else "empty")
+            if not fetched:
+                raise MarketplaceUnavailable(f"{self.name} answered none of the {pages} result pages")
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,453 @@
+import logging
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CAPTCHA_MARKER = "not a robot"
+
+PRICE_STRING_PATTERN = re.compile(r'₹|Rs\.|\d+,\d+')
+PRICE_PATTERN = re.compile(r'(?:₹|Rs\.)?[,\d]+(?:\.\d+)?')
+PRICE_CLEAN_PATTERN = re.compile(r'[^\d,.]')
+RATING_PATTERN = re.compile(r'(\d+(\.\d+)?)')
+REVIEWS_PATTERN = re.compile(r'(\d+[,\d]*)')
+
+# Compiled selector table: field -> ordered (tag, class) candidates.
+# A class containing spaces must match the whole class attribute (BeautifulSoup
+# semantics), a single class matches any token of the attribute.
+SELECTORS = {
+    'title': [
+        ('span', 'a-text-normal'),
+        ('h2', 'a-size-mini'),
+        ('a', 'a-link-normal s-underline-text s-underline-link-text s-link-style a-text-normal'),
+        ('span', 'a-size-medium a-color-base a-text-normal'),
+        ('span', 'a-size-base-plus a-color-base a-text-normal'),
+    ],
+    'link': [
+        ('a', 'a-link-normal s-no-outline'),
+        ('a', 'a-link-normal'),
+    ],
+    'price': [
+        ('span', 'a-price-whole'),
+        ('span', 'a-offscreen'),
+    ],
+    'rating': [
+        ('span', 'a-icon-alt'),
+    ],
+    'reviews': [
+        ('span', 'a-size-base s-underline-text'),
+        ('span', 'a-size-base'),
+    ],
+    'image': [
+        ('img', 's-image'),
+        ('img', None),
+    ],
+    'prime': [
+        ('i', 'a-icon-prime'),
+    ],
+    'badge': [
+        ('span', 'a-badge-label'),
+    ],
+}
+
+
+def _compile_selectors(selectors: Dict[str, List]) -> Dict[str, List]:
+    """Index the selector table by tag so each element is checked only against its own candidates."""
+    by_tag = {}
+    for field, candidates in selectors.items():
+        for priority, (tag, cls) in enumerate(candidates):
+            if cls is None:
+                match = None
+            elif ' ' in cls:
+                match = (True, cls)
+            else:
+                match = (False, cls)
+            by_tag.setdefault(tag, []).append((field, priority, match))
+    return by_tag
+
+
+COMPILED_SELECTORS = _compile_selectors(SELECTORS)
+
+
+def clean_title(title: str) -> str:
+    """Normalize whitespace, drop zero-width spaces and truncate long titles."""
+    title = ' '.join(title.split())
+    title = title.replace('\u200b', '')
+    if len(title) > 200:
+        title = title[:197] + '...'
+    return title
+
+
+def absolute_link(href: str) -> str:
+    return f"https://www.amazon.in{href}" if href.startswith('/') else href
+
+
+def parse_price(price_text: str) -> int:
+    """Convert a raw price string such as '₹1,23,999.00' to an integer amount in INR."""
+    price_text = price_text.strip()
+    price_match = PRICE_PATTERN.search(price_text)
+    if price_match:
+        price_text = price_match.group(0)
+
+    price_text = PRICE_CLEAN_PATTERN.sub('', price_text)
+    if not price_text:
+        return 0
+
+    try:
+        if '.' in price_text:
+            return int(float(price_text.replace(',', '')))
+        return int(price_text.replace(',', ''))
+    except ValueError:
+        return 0
+
+
+def parse_rating(text: str) -> float:
+    rating_match = RATING_PATTERN.search(text)
+    return float(rating_match.group(1)) if rating_match else 0
+
+
+def parse_reviews(text: str) -> int:
+    reviews_match = REVIEWS_PATTERN.search(text)
+    return int(reviews_match.group(1).replace(',', '')) if reviews_match else 0
+
+
+def _parse_container_lxml(container) -> Optional[Dict]:
+    """Extract a product dict from a single lxml result node in one pass over its descendants."""
+    found = {}
+    first_h2 = None
+    anchors = []
+
+    for elem in container.iter('span', 'h2', 'a', 'img', 'i'):
+        tag = elem.tag
+        if tag == 'a':
+            anchors.append(elem)
+        elif tag == 'h2' and first_h2 is None:
+            first_h2 = elem
+
+        class_attr = elem.get('class')
+        tokens = class_attr.split() if class_attr else ()
+        for field, priority, match in COMPILED_SELECTORS[tag]:
+            key = (field, priority)
+            if key in found:
+                continue
+            if match is None:
+                found[key] = elem
+            elif match[0]:
+                if class_attr == match[1]:
+                    found[key] = elem
+            elif match[1] in tokens:
+                found[key] = elem
+
+    def first(field):
+        for priority in range(len(SELECTORS[field])):
+            elem = found.get((field, priority))
+            if elem is not None:
+                return elem
+        return None
+
+    # Title: first pattern whose first match has text, then h2, then any long anchor text
+    title = None
+    for priority in range(len(SELECTORS['title'])):
+        elem = found.get(('title', priority))
+        if elem is not None:
+            text = elem.text_content().strip()
+            if text:
+                title = clean_title(text)
+                break
+    if title is None and first_h2 is not None:
+        title = first_h2.text_content().strip()
+    if title is None:
+        for a in anchors:
+            text = a.text_content().strip()
+            if len(text) > 10:
+                title = text
+                break
+    if not title or title == 'N/A':
+        return None
+
+    product = {'title': title, 'asin': container.get('data-asin', 'N/A')}
+
+    link_elem = first('link')
+    if link_elem is not None and link_elem.get('href') is not None:
+        product['link'] = absolute_link(link_elem.get('href'))
+    else:
+        for a in anchors:
+            href = a.get('href')
+            if href is not None and '/dp/' in href:
+                product['link'] = absolute_link(href)
+                break
+        else:
+            product['link'] = f"https://www.amazon.in/dp/{product['asin']}" if product['asin'] != 'N/A' else 'N/A'
+
+    price_elem = first('price')
+    if price_elem is not None:
+        price_text = price_elem.text_content()
+    else:
+        price_text = None
+        for text in container.itertext():
+            if PRICE_STRING_PATTERN.search(text) and ('₹' in text or 'Rs.' in text):
+                price_text = text
+                break
+    product['currency'] = '₹'
+    product['price'] = parse_price(price_text) if price_text is not None else 0
+
+    rating_elem = first('rating')
+    rating_text = rating_elem.text_content() if rating_elem is not None else ''
+    product['rating'] = parse_rating(rating_text) if rating_text else 0
+
+    reviews_elem = first('reviews')
+    reviews_text = reviews_elem.text_content() if reviews_elem is not None else ''
+    product['reviews'] = parse_reviews(reviews_text) if reviews_text else 0
+
+    img_elem = first('image')
+    src = img_elem.get('src') if img_elem is not None else None
+    product['featured_image'] = src if src is not None else 'N/A'
+
+    product['is_prime'] = first('prime') is not None
+
+    badge_elem = first('badge')
+    badge_text = badge_elem.text_content() if badge_elem is not None else ''
+    product['is_best_seller'] = 'Bestseller' in badge_text
+    product['is_amazon_choice'] = "Amazon's Choice" in badge_text
+
+    return product
+
+
+def iter_lxml(html, n: int = 20) -> Iterator[Dict]:
+    """Parse an Amazon search results page with lxml, yielding each product as its container is parsed."""
+    from lxml import html as lxml_html
+
+    doc = lxml_html.fromstring(html)
+    containers = doc.xpath('//div[@data-component-type="s-search-result"]')
+    if not containers:
+        containers = doc.xpath('//div[string-length(@data-asin) > 0]')
+
+    for container in containers[:n]:
+        try:
+            product = _parse_container_lxml(container)
+        except Exception as e:
+            logger.warning("Error processing product: %s", e)
+            continue
+        if product is not None:
+            logger.debug("Parsed %s: %s (%s)", product['asin'], product['title'], product['price'])
+            yield product
+
+
+def parse_lxml(html, n: int = 20) -> List[Dict]:
+    """Parse an Amazon search results page with lxml."""
+    return list(iter_lxml(html, n))
+
+
+def _parse_container_bs4(container) -> Optional[Dict]:
+    """Extract a product dict from a single BeautifulSoup result node."""
+    product = {}
+
+    def extract_title():
+        for tag, cls in SELECTORS['title']:
+            title_elem = container.find(tag, {'class': cls})
+            if title_elem and title_elem.text.strip():
+                return clean_title(title_elem.text.strip())
+
+        h2_elem = container.find('h2')
+        if h2_elem:
+            return h2_elem.text.strip()
+
+        for a in container.find_all('a'):
+            if a.text and len(a.text.strip()) > 10:
+                return a.text.strip()
+
+        return 'N/A'
+
+    product['title'] = extract_title()
+    if product['title'] == 'N/A':
+        return None
+
+    product['asin'] = container.get('data-asin', 'N/A')
+
+    link_elem = container.find('a', {'class': 'a-link-normal s-no-outline'})
+    if not link_elem:
+        link_elem = container.find('a', {'class': 'a-link-normal'})
+
+    if link_elem and 'href' in link_elem.attrs:
+        product['link'] = absolute_link(link_elem['href'])
+    else:
+        for a in container.find_all('a'):
+            if 'href' in a.attrs and '/dp/' in a['href']:
+                product['link'] = absolute_link(a['href'])
+                break
+        else:
+            product['link'] = f"https://www.amazon.in/dp/{product['asin']}" if product['asin'] != 'N/A' else 'N/A'
+
+    def extract_price():
+        price_elem = container.find('span', {'class': 'a-price-whole'})
+        if not price_elem:
+            price_elem = container.find('span', {'class': 'a-offscreen'})
+        if not price_elem:
+            for pattern in container.find_all(string=PRICE_STRING_PATTERN):
+                if '₹' in pattern or 'Rs.' in pattern:
+                    price_elem = pattern
+                    break
+        if not price_elem:
+            return 0
+
+        if hasattr(price_elem, 'text'):
+            return parse_price(price_elem.text)
+        return parse_price(str(price_elem))
+
+    product['currency'] = '₹'
+    product['price'] = extract_price()
+
+    rating_elem = container.find('span', {'class': 'a-icon-alt'})
+    product['rating'] = parse_rating(rating_elem.text) if rating_elem and rating_elem.text else 0
+
+    reviews_elem = container.find('span', {'class': 'a-size-base s-underline-text'})
+    if not reviews_elem:
+        reviews_elem = container.find('span', {'class': 'a-size-base'})
+    product['reviews'] = parse_reviews(reviews_elem.text) if reviews_elem and reviews_elem.text else 0
+
+    img_elem = container.find('img', {'class': 's-image'})
+    if not img_elem:
+        img_elem = container.find('img')
+    product['featured_image'] = img_elem['src'] if img_elem and 'src' in img_elem.attrs else 'N/A'
+
+    product['is_prime'] = bool(container.find('i', {'class': 'a-icon-prime'}))
+
+    badge_elem = container.find('span', {'class': 'a-badge-label'})
+    badge_text = badge_elem.text if badge_elem else ''
+    product['is_best_seller'] = 'Bestseller' in badge_text
+    product['is_amazon_choice'] = "Amazon's Choice" in badge_text
+
+    return product
+
+
+def iter_bs4(html, n: int = 20) -> Iterator[Dict]:
+    """Parse an Amazon search results page with BeautifulSoup, yielding each product as its container is parsed."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    containers = soup.find_all('div', {'data-component-type': 's-search-result'})
+    if not containers:
+        containers = soup.find_all('div', {'data-asin': re.compile(r'.+')})
+
+    for container in containers[:n]:
+        try:
+            product = _parse_container_bs4(container)
+        except Exception as e:
+            logger.warning("Error processing product: %s", e)
+            continue
+        if product is not None:
+            logger.debug("Parsed %s: %s (%s)", product['asin'], product['title'], product['price'])
+            yield product
+
+
+def parse_bs4(html, n: int = 20) -> List[Dict]:
+    """Parse an Amazon search results page with BeautifulSoup (slow fallback)."""
+    return list(iter_bs4(html, n))
+
+
+PARSERS: Dict[str, Callable[..., List[Dict]]] = {
+    'lxml': parse_lxml,
+    'bs4': parse_bs4,
+}
+
+STREAMING_PARSERS: Dict[str, Callable[..., Iterator[Dict]]] = {
+    'lxml': iter_lxml,
+    'bs4': iter_bs4,
+}
+
+
+def default_backend() -> str:
+    """Return 'lxml' when it is installed, otherwise the BeautifulSoup fallback."""
+    try:
+        import lxml.html  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'bs4'
+
+
+DEFAULT_BACKEND = default_backend()
+
+
+def is_captcha_page(html) -> bool:
+    if isinstance(html, bytes):
+        return CAPTCHA_MARKER.encode() in html
+    return CAPTCHA_MARKER in html
+
+
+def parse_search_results(html, n: int = 20, backend: Optional[str] = None) -> List[Dict]:
+    """
+    Parse an Amazon India search results page into product dicts.
+
+    Args:
+        html (str | bytes): Raw search page
+        n (int): Maximum number of result containers to parse
+        backend (str): 'lxml' or 'bs4', defaults to the fastest installed backend
+
+    Returns:
+        List[Dict]: List of product dictionaries with details
+    """
+    return PARSERS[backend or DEFAULT_BACKEND](html, n)
+
+
+def iter_search_results(html, n: int = 20, backend: Optional[str] = None) -> Iterator[Dict]:
+    """Like parse_search_results, but yield each product as soon as its container is parsed."""
+    return STREAMING_PARSERS[backend or DEFAULT_BACKEND](html, n)
+
+
+def parity_differences(html, n: int = 20) -> List[str]:
+    """
+    Compare the lxml and bs4 backends field by field on one page.
+
+    Returns:
+        List[str]: One line per differing product count or field, empty when the backends agree
+    """
+    lxml_products, bs4_products = parse_lxml(html, n), parse_bs4(html, n)
+    differences = []
+    if len(lxml_products) != len(bs4_products):
+        differences.append(f"lxml parsed {len(lxml_products)} products, bs4 {len(bs4_products)}")
+    for i, (lxml_product, bs4_product) in enumerate(zip(lxml_products, bs4_products)):
+        for field in sorted(lxml_product.keys() | bs4_product.keys()):
+            if lxml_product.get(field) != bs4_product.get(field):
+                differences.append(f"product {i} ({lxml_product.get('asin')}) {field}: "
+                                   f"lxml {lxml_product.get(field)!r} != bs4 {bs4_product.get(field)!r}")
+    return differences
+
+
+def benchmark_parsers(html, n: int = 20, repeat: int = 20) -> Dict[str, float]:
+    """Return the mean parse time in milliseconds of each available backend."""
+    timings = {}
+    for name, parse in PARSERS.items():
+        try:
+            parse(html, n)
+        except ImportError:
+            continue
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse(html, n)
+        timings[name] = (time.perf_counter() - start) * 1000 / repeat
+    return timings
+
+
+# Saved amazon.in results pages, also served by the stand-in server and replayed by bench.py
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Parity and parse-time check on saved search pages, the committed fixtures by default;
+# exits with status 1 when the backends disagree on any field:
+#   python -m amazon_scrapper.parser [saved_search.html ...]
+if __name__ == "__main__":
+    paths = sys.argv[1:] or sorted(os.path.join(FIXTURES_DIR, name) for name in os.listdir(FIXTURES_DIR)
+                                   if name.endswith('.html'))
+    failed = False
+    for path in paths:
+        with open(path, 'rb') as f:
+            page = f.read()
+        differences = parity_differences(page)
+        for line in differences:
+            print(f"{path}: {line}")
+        failed = failed or bool(differences)
+        timings = ", ".join(f"{name} {ms:.2f} ms/page" for name, ms in benchmark_parsers(page).items())
+        print(f"{path}: {'MISMATCH' if differences else 'ok'} ({timings})")
+    sys.exit(1 if failed else 0)
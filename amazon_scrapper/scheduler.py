@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from tracing import gauge, incr
+
+# Request priorities, lower is served first
+INTERACTIVE = 0
+BATCH = 1
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("fetch_priority", default=INTERACTIVE)
+
+HEADER_PROFILES = [
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept-Language': 'en-US,en;q=0.9',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15',
+        'Accept-Language': 'en-IN,en;q=0.9',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0',
+        'Accept-Language': 'en-GB,en;q=0.8',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+        'Accept-Language': 'en-IN,en-US;q=0.9,en;q=0.8',
+    },
+]
+
+
+@contextmanager
+def priority(level: int):
+    """Run fetches started in this block (and in run_sync calls from it) at the given priority."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class AdaptiveScheduler:
+    """
+    Process-wide token bucket for one host that adapts to how the host responds.
+
+    Successful pages raise the rate additively up to `max_rate`. Captchas and
+    throttling responses cut it multiplicatively and pause all requests for a
+    cooldown that doubles with every consecutive strike; empty result pages
+    only cut the rate. Waiting requests are granted tokens in priority order,
+    so interactive queries go before batch work. Every request gets the next
+    header profile from the pool.
+
+    The scheduler is guarded by a thread lock rather than asyncio primitives,
+    so fetchers on different event loops share it.
+
+    Args:
+        rate (float): Initial requests per second
+        max_rate (float): Upper bound the rate recovers to
+        min_rate (float): Lower bound after repeated strikes
+        burst (float): Bucket capacity
+        increase (float): Requests per second added after each good page
+        decrease (float): Factor applied to the rate on a strike
+        cooldown (float): Pause in seconds after the first strike
+        max_cooldown (float): Longest pause in seconds
+        profiles (List[Dict]): Header profiles to rotate through
+    """
+
+    def __init__(self, rate: float = 1.0, max_rate: float = 4.0, min_rate: float = 0.05, burst: float = 2.0,
+                 increase: float = 0.05, decrease: float = 0.5, cooldown: float = 2.0, max_cooldown: float = 120.0,
+                 profiles: Optional[List[Dict]] = None, name: str = ""):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.profiles = profiles or HEADER_PROFILES
+        self.name = name
+        self.tokens = burst
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.stats = {"ok": 0, "captcha": 0, "throttled": 0, "empty": 0}
+        self._updated = time.monotonic()
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._profile = itertools.cycle(range(len(self.profiles)))
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_acquire(self, ticket) -> float:
+        """Take a token for ticket and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self._waiters[0] != ticket:
+                return min(0.05, 1 / self.rate)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                heapq.heappop(self._waiters)
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait for a token at the priority of the current context."""
+        ticket = (_priority.get(), next(self._seq))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        try:
+            while (wait := self._try_acquire(ticket)) > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            with self._lock:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+            raise
+
+    def headers(self) -> Dict:
+        with self._lock:
+            return self.profiles[next(self._profile)]
+
+    def report(self, outcome: str):
+        """Adapt to a response: 'ok', 'empty', 'captcha' or 'throttled'."""
+        with self._lock:
+            self.stats[outcome] += 1
+            if outcome == "ok":
+                self.strikes = 0
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            else:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                if outcome in ("captcha", "throttled"):
+                    self.strikes += 1
+                    pause = min(self.max_cooldown, self.cooldown * 2 ** (self.strikes - 1))
+                    self.blocked_until = time.monotonic() + pause
+                    self.tokens = 0.0
+            rate = self.rate
+        incr("shoppin_fetch_outcomes_total", host=self.name, outcome=outcome)
+        gauge("shoppin_fetch_rate", rate, host=self.name)
+
+
+# Keyword arguments for schedulers created by get_scheduler(), see configure_scheduler()
+SCHEDULER_OPTIONS: Dict = {}
+_schedulers: Dict[str, AdaptiveScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(host: str) -> AdaptiveScheduler:
+    """Return the process-wide scheduler for a host."""
+    with _schedulers_lock:
+        if host not in _schedulers:
+            _schedulers[host] = AdaptiveScheduler(name=host, **SCHEDULER_OPTIONS)
+        return _schedulers[host]
+
+
+def configure_scheduler(**options):
+    """Set AdaptiveScheduler options (e.g. max_rate) for every host, replacing existing schedulers."""
+    with _schedulers_lock:
+        SCHEDULER_OPTIONS.update(options)
+        _schedulers.clear()
@@ -0,0 +1,127 @@
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import parse_qs, urlsplit
+
+
+CAPTCHA_PAGE = (b"<html><body><h4>Enter the characters you see below</h4>"
+                b"<p>Sorry, we just need to make sure you're not a robot.</p></body></html>")
+
+
+def make_handler(directory: str, latency: float = 0.0, captcha_rate: float = 0.0, throttle_rate: float = 0.0,
+                 seed: int = 0):
+    """
+    Build a request handler that serves recorded search pages.
+
+    A request for '?page=N' is answered with '<directory>/page<N>.html', falling back
+    to 'page1.html'. Every response is delayed by `latency` seconds to mimic Amazon.
+    A `captcha_rate` share of requests gets a captcha page and a `throttle_rate`
+    share a 503, drawn from a seeded generator so runs are repeatable.
+    """
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class RecordedPageHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with rng_lock:
+                draw = rng.random()
+            if draw < throttle_rate:
+                self.send_error(503)
+                return
+            if draw < throttle_rate + captcha_rate:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(CAPTCHA_PAGE)))
+                self.end_headers()
+                self.wfile.write(CAPTCHA_PAGE)
+                return
+
+            query = parse_qs(urlsplit(self.path).query)
+            page = query.get('page', ['1'])[0]
+            path = os.path.join(directory, f"page{page}.html")
+            if not os.path.exists(path):
+                path = os.path.join(directory, "page1.html")
+
+            if latency:
+                time.sleep(latency)
+
+            try:
+                with open(path, 'rb') as f:
+                    body = f.read()
+            except OSError:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return RecordedPageHandler
+
+
+@contextmanager
+def serve_recorded_pages(directory: str, latency: float = 0.0, port: int = 0, captcha_rate: float = 0.0,
+                         throttle_rate: float = 0.0) -> Iterator[str]:
+    """Serve recorded pages on localhost and yield the search URL to pass as `base_url`."""
+    handler = make_handler(directory, latency, captcha_rate, throttle_rate)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/s"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# Latency benchmark of serial vs concurrent page fetches against recorded pages:
+#   python -m amazon_scrapper.stand_in recorded_pages_dir [pages] [latency]
+# With a captcha rate, a drill of the adaptive scheduler against injected captchas:
+#   python -m amazon_scrapper.stand_in recorded_pages_dir 20 0.05 0.3
+if __name__ == "__main__":
+    from amazon_scrapper.marketplace import MarketplaceUnavailable
+    from amazon_scrapper.scheduler import configure_scheduler, get_scheduler
+    from amazon_scrapper.scrapper import scrape_amazon_india
+
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    captcha_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+
+    if captcha_rate:
+        configure_scheduler(cooldown=0.5, max_cooldown=5.0)
+        with serve_recorded_pages(sys.argv[1], latency=latency, captcha_rate=captcha_rate) as base_url:
+            scheduler = get_scheduler(urlsplit(base_url).netloc)
+            start = time.perf_counter()
+            found = 0
+            for query in range(1, pages + 1):
+                try:
+                    found += bool(scrape_amazon_india("laptop", 10000, 90000, n=1000, pages=1, base_url=base_url))
+                except MarketplaceUnavailable:
+                    pass
+                print(f"query {query:>3}: rate {scheduler.rate:.2f}/s  strikes {scheduler.strikes}")
+        print(f"{found}/{pages} queries answered in {time.perf_counter() - start:.2f}s  {scheduler.stats}")
+        sys.exit()
+
+    # Pacing isn't under test here
+    configure_scheduler(rate=1000.0, max_rate=1000.0, burst=1000.0)
+    with serve_recorded_pages(sys.argv[1], latency=latency) as base_url:
+        start = time.perf_counter()
+        for page in range(1, pages + 1):
+            scrape_amazon_india("laptop", 10000, 90000, n=1000, pages=1, base_url=base_url)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scrape_amazon_india("laptop", 10000, 90000, n=1000, pages=pages, base_url=base_url)
+        concurrent = time.perf_counter() - start
+
+    print(f"serial: {serial:.2f}s  concurrent: {concurrent:.2f}s  for {pages} pages")
@@ -1,14 +1,41 @@
-from main import graph
+import argparse
+import sys
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--profile-startup", action="store_true",
+                    help="print an import-time breakdown and agent build/warm-up times, then exit")
+args, _ = parser.parse_known_args()
+if args.profile_startup:
+    from startup import profile_startup
+    profile_startup()
+    sys.exit()
+
+import asyncio
+import threading
+from main import get_graph, warm_up
+from serving import session_thread_id, stream_reply
+from tracing import serve_metrics
 import gradio as gr
 import os
 
-def chat_with_gpt(query, history):
-    config = {"configurable": {"thread_id": "1"}}
-    inputs = {"messages": [("user",f"Provide users with link of the product with detailed report for each of the top 5 products found based on the query:{query}")]}
+# Number of chat turns handled concurrently by the Gradio queue
+CONCURRENCY = int(os.getenv("SHOPPIN_CONCURRENCY", 16))
 
-    response = graph.invoke(inputs, config=config)
-    return str(response['messages'][-1].content)
+async def chat_with_gpt(query, history, request: gr.Request):
+    # Waits for the background warm-up if it is still building the agent
+    graph = await asyncio.to_thread(get_graph)
+    async for partial in stream_reply(graph, query, session_thread_id(request)):
+        yield partial
 
 
+# Set SHOPPIN_METRICS_PORT to expose Prometheus metrics at /metrics
+if os.getenv("SHOPPIN_METRICS_PORT"):
+    serve_metrics(int(os.getenv("SHOPPIN_METRICS_PORT")))
+
 iface = gr.ChatInterface(fn=chat_with_gpt, fill_width= True, description="Hi, How may I help you" ,title = "DocBot", css = 'styles.css')
-iface.launch(server_name= "0.0.0.0", server_port= 8003)
+iface.queue(default_concurrency_limit=CONCURRENCY)
+iface.launch(server_name= "0.0.0.0", server_port= 8003, prevent_thread_lock=True)
+
+# The port is bound: build the agent and open outbound connections while the first user arrives
+threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+iface.block_thread()
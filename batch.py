@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from amazon_scrapper.scheduler import BATCH, configure_scheduler, priority
+
+
+def read_queries(path: str, field: str = "query", id_field: str = "id") -> Iterator[Tuple[str, str]]:
+    """
+    Stream (id, query) pairs from a JSONL file or a plain text file with one query per line.
+
+    JSONL records without `id_field` are numbered by line.
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                yield str(record.get(id_field, line_number)), record[field]
+            else:
+                yield str(line_number), line
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids already answered without an error in a JSONL output, so a crashed run
+    can resume where it stopped. Failed queries are left out and run again.
+    """
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record.get("error") is None:
+                    done.add(record["id"])
+            except (ValueError, KeyError):
+                # A torn last line from a crash; that query is simply run again
+                continue
+    return done
+
+
+class JSONLWriter:
+    def __init__(self, path: str):
+        self._file = open(path, 'a', buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Buffer records and append them to a Parquet file one row group at a time (needs pyarrow)."""
+
+    def __init__(self, path: str, row_group_size: int = 1000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([("id", pa.string()), ("query", pa.string()), ("products", pa.string()),
+                                  ("error", pa.string()), ("seconds", pa.float64())])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+        self._row_group_size = row_group_size
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict):
+        row = dict(record, products=json.dumps(record["products"], ensure_ascii=False))
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) >= self._row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._writer.close()
+
+
+def run_batch(input_path: str, output_path: str, workers: int = 8, field: str = "query", id_field: str = "id",
+              rate_per_host: Optional[float] = None, pipeline=None) -> Dict[str, float]:
+    """
+    Answer every query in input_path with the search pipeline and write one record per query.
+
+    Queries are streamed through a pool of `workers` threads with at most
+    2 * workers queued at a time. Their fetches run at batch priority, so
+    interactive queries in the same process are served first. Identical rephrased queries share one scrape
+    through the search cache. A query whose search was cut short by a failed or
+    blocked marketplace is recorded with an error instead of an empty answer.
+    Ids already answered in a JSONL output are skipped,
+    so rerunning after a crash resumes the batch and retries the queries that
+    failed (a retried id is appended again, its last record wins); Parquet
+    files can't be appended to, so a Parquet run always starts over.
+
+    Args:
+        input_path (str): JSONL or text file of queries
+        output_path (str): '.jsonl' or '.parquet' output file
+        workers (int): Concurrent queries
+        field (str): JSONL field holding the query
+        id_field (str): JSONL field holding a stable query id
+        rate_per_host (float): Maximum requests per second to Amazon
+        pipeline: Callable query -> products, defaults to tools.top_5_products
+
+    Returns:
+        Dict[str, float]: Throughput summary
+    """
+    if pipeline is None:
+        from tools import top_5_products as pipeline
+    if rate_per_host:
+        configure_scheduler(rate=min(rate_per_host, 1.0), max_rate=rate_per_host)
+
+    parquet = output_path.endswith(".parquet")
+    done = set() if parquet else completed_ids(output_path)
+    writer = ParquetWriter(output_path) if parquet else JSONLWriter(output_path)
+    summary = {"processed": 0, "failed": 0, "skipped": 0}
+    slots = threading.BoundedSemaphore(2 * workers)
+    lock = threading.Lock()
+
+    def answer(query_id: str, query: str):
+        start = time.perf_counter()
+        try:
+            try:
+                with priority(BATCH):
+                    products, error = pipeline(query), None
+            except Exception as e:
+                products, error = [], str(e)
+            writer.write({"id": query_id, "query": query, "products": products, "error": error,
+                          "seconds": round(time.perf_counter() - start, 3)})
+            with lock:
+                summary["processed"] += 1
+                summary["failed"] += error is not None
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for query_id, query in read_queries(input_path, field, id_field):
+                if query_id in done:
+                    summary["skipped"] += 1
+                    continue
+                slots.acquire()
+                pool.submit(answer, query_id, query)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = round(elapsed, 3)
+    summary["queries_per_second"] = round(summary["processed"] / elapsed, 3) if elapsed else 0.0
+    return summary
+
+
+# Batch search without the chat agent:
+#   python batch.py queries.jsonl results.jsonl --workers 16 --rate 2
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--field", default="query")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--rate", type=float, default=None, help="maximum requests per second to Amazon")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output, args.workers, args.field, args.id_field, args.rate)
+    if summary["processed"]:
+        from tools import search_cache
+        summary["search_cache"] = search_cache.info()
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,311 @@
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+import httpx
+import numpy as np
+
+from amazon_scrapper.parser import FIXTURES_DIR
+from replay import Cassette, OfflineChatModel, use_cassette
+
+# Recorded offline with --record --offline, so --check runs from a clean checkout
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+DEFAULT_CASSETTE = os.path.join(BENCHMARKS_DIR, "cassette.json.gz")
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+# Saved results pages for the benchmark queries other than 'laptop', see fixture_transport()
+BENCH_PAGES_DIR = os.path.join(BENCHMARKS_DIR, "pages")
+
+BENCH_QUERIES = [
+    "phone under 20000",
+    "laptop between 50000 and 80000",
+    "running shoes under 3k",
+    "noise cancelling headphones for travel around 15000",
+    "a gift for my dad who likes cooking, nothing over 5000",
+]
+
+RERANK_SIZES = (5, 50, 500, 2000)
+
+# Below this a slowdown is timer noise, whatever the ratio
+MIN_REGRESSION_MS = 1.0
+
+
+def median_ms(fn: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def reset_pipeline(cassette: Cassette):
+    """Fresh in-memory caches, catalog and embedding store in tools, so every pass starts cold."""
+    import tools
+    from cache import TTLCache
+    from catalog import ProductCatalog
+    from embeddings import EmbeddingStore
+    from replay import ReplayEmbeddings
+
+    tools.search_cache = TTLCache(maxsize=512, ttl=30 * 60, name="search")
+    tools.query_cache = TTLCache(maxsize=2048, ttl=24 * 60 * 60, name="query")
+    tools.catalog = ProductCatalog()
+    provider = tools.embedding_store.provider
+    if not isinstance(provider, ReplayEmbeddings):
+        provider = ReplayEmbeddings(cassette)
+    tools.embedding_store = EmbeddingStore(provider, model=tools.embedding_store.model)
+
+
+def run_queries(queries: List[str]) -> List[float]:
+    import tools
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            tools.top_5_products(query)
+        except AssertionError:
+            # Incomplete or off-topic queries end in an AssertionError by design
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run_streamed_queries(queries: List[str]) -> List[float]:
+    """Milliseconds until tools.stream_top_5_products yields its first (provisional) top 5, per query."""
+    import tools
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            for _ in tools.stream_top_5_products(query):
+                latencies.append((time.perf_counter() - start) * 1000)
+                break
+        except AssertionError:
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def llm_extract(query: str):
+    import tools
+
+    try:
+        return tools._llm_process_query(query)
+    except AssertionError:
+        return None
+
+
+def bench_parse(cassette: Cassette, repeat: int) -> Dict[str, float]:
+    """Milliseconds to parse one recorded results page, per parser backend."""
+    from amazon_scrapper.parser import PARSERS, parse_search_results
+
+    pages = [base64.b64decode(entry["body"]) for entry in cassette.entries["http"].values()]
+    results = {}
+    for backend in PARSERS:
+        results[f"parse.{backend}"] = statistics.median(
+            median_ms(lambda: parse_search_results(page, n=20, backend=backend), repeat) for page in pages
+        )
+    return results
+
+
+def bench_query_extraction(repeat: int) -> Dict[str, float]:
+    """Milliseconds per query on the rule-based fast path and on the (replayed) LLM path."""
+    from query_parser import extract_query_details
+
+    return {
+        "query.fast": median_ms(lambda: [extract_query_details(q) for q in BENCH_QUERIES], repeat) / len(BENCH_QUERIES),
+        "query.llm": median_ms(lambda: [llm_extract(q) for q in BENCH_QUERIES], repeat) / len(BENCH_QUERIES),
+    }
+
+
+def bench_rerank(repeat: int, dim: int = 1536) -> Dict[str, float]:
+    """
+    Milliseconds to filter, look up cached embeddings and rerank a pool of
+    synthetic candidates, per pool size.
+    """
+    from embeddings import EmbeddingStore, HashingEmbeddings
+    from filters import filter_products
+    from products import ProductBatch
+    from rerank import RerankWeights, rerank
+
+    rng = np.random.default_rng(0)
+
+    results = {}
+    for size in RERANK_SIZES:
+        products = [
+            {'title': f"Product {i}", 'asin': f"B0{i:08d}", 'price': int(rng.integers(1000, 100_000)),
+             'rating': float(rng.integers(0, 50)) / 10, 'reviews': int(rng.integers(0, 10_000)),
+             'is_prime': bool(i % 2), 'is_best_seller': False, 'is_amazon_choice': False}
+            for i in range(size)
+        ]
+        store = EmbeddingStore(HashingEmbeddings(dim), capacity=size + 1)
+        store.embed(["query"] + ProductBatch.from_dicts(products).texts())
+
+        def run():
+            batch, _ = filter_products(ProductBatch.from_dicts(products), 0, 200_000)
+            embeddings = store.embed(["query"] + batch.texts())
+            rerank(embeddings[0], embeddings[1:], batch, k=5, weights=RerankWeights(rating=0.2))
+
+        results[f"rerank.{size}"] = median_ms(run, repeat)
+    return results
+
+
+def bench_end_to_end(cassette: Cassette, repeat: int) -> Dict[str, float]:
+    """
+    Milliseconds per tools.top_5_products call, with cold caches and again warm,
+    and until the streaming tool's first provisional top 5 with cold caches.
+    """
+    cold, warm, first = [], [], []
+    for _ in range(repeat):
+        reset_pipeline(cassette)
+        cold += run_queries(BENCH_QUERIES)
+        warm += run_queries(BENCH_QUERIES)
+        reset_pipeline(cassette)
+        first += run_streamed_queries(BENCH_QUERIES)
+    return {"e2e.cold": statistics.median(cold), "e2e.warm": statistics.median(warm),
+            "e2e.first_result": statistics.median(first)}
+
+
+def fixture_transport(directory: str = FIXTURES_DIR, pages_dir: str = BENCH_PAGES_DIR) -> httpx.MockTransport:
+    """
+    Answer every search with a saved results page, keeping only the results
+    inside the request's price refinement as Amazon does: '<pages_dir>/<name>.html'
+    when every word of its hyphenated name is in the search keywords, otherwise
+    the saved laptop page of the requested page number (page1.html by default).
+    """
+    from lxml import html as lxml_html
+
+    from amazon_scrapper.parser import parse_search_results
+
+    named_pages = {name[:-len(".html")]: os.path.join(pages_dir, name)
+                   for name in os.listdir(pages_dir) if name.endswith(".html")} if os.path.isdir(pages_dir) else {}
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        keywords = set(request.url.params.get('k', '').lower().split())
+        path = next((path for name, path in sorted(named_pages.items()) if set(name.split('-')) <= keywords), None)
+        if path is None:
+            path = os.path.join(directory, f"page{request.url.params.get('page', '1')}.html")
+        if not os.path.exists(path):
+            path = os.path.join(directory, "page1.html")
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        refinement = request.url.params.get('rh')
+        if refinement:
+            # 'p_36:<min>-<max>' in paisa, either end open
+            low, high = (int(bound) // 100 if bound else None for bound in refinement[len('p_36:'):].split('-'))
+            outside = {product['asin'] for product in parse_search_results(body, n=100)
+                       if (low is not None and product['price'] < low)
+                       or (high is not None and product['price'] > high) or not product['price']}
+            doc = lxml_html.fromstring(body)
+            for container in doc.xpath('//div[@data-component-type="s-search-result"]'):
+                if container.get('data-asin') in outside:
+                    container.drop_tree()
+            body = lxml_html.tostring(doc, encoding='utf-8')
+        return httpx.Response(200, headers={"content-type": "text/html;charset=UTF-8"}, content=body)
+
+    return httpx.MockTransport(handle)
+
+
+def record(cassette: Cassette, offline: bool = False):
+    """
+    Run every benchmarked call once, filling the cassette. Live services are
+    recorded by default; offline, the saved pages (see fixture_transport),
+    HashingEmbeddings and OfflineChatModel answer instead.
+
+    Raises:
+        RuntimeError: A benchmark query found no products, so the end-to-end
+            benchmarks would skip embedding and reranking it
+    """
+    import tools
+
+    if offline:
+        from amazon_scrapper.scheduler import configure_scheduler
+        from embeddings import HashingEmbeddings
+
+        # Saved pages come back instantly, there is no host to be polite to
+        configure_scheduler(rate=1e6, max_rate=1e6, burst=1e6)
+        use_cassette(cassette, llm=OfflineChatModel(), embeddings=HashingEmbeddings(dim=1536),
+                     transport=fixture_transport())
+    else:
+        use_cassette(cassette)
+    for query in BENCH_QUERIES:
+        llm_extract(query)
+    reset_pipeline(cassette)
+    run_queries(BENCH_QUERIES)
+    run_queries(BENCH_QUERIES)
+    empty = [query for query in BENCH_QUERIES if not tools.top_5_products(query)]
+    if empty:
+        raise RuntimeError(f"No products recorded for {empty}")
+    reset_pipeline(cassette)
+    run_streamed_queries(BENCH_QUERIES)
+    cassette.save()
+
+
+def run_benchmarks(cassette: Cassette, repeat: int = 5) -> Dict[str, float]:
+    from amazon_scrapper.scheduler import configure_scheduler
+
+    use_cassette(cassette)
+    # Replayed responses come back instantly, pacing them would only measure the rate limiter
+    configure_scheduler(rate=1e6, max_rate=1e6, burst=1e6)
+    results = {}
+    results.update(bench_parse(cassette, repeat))
+    results.update(bench_query_extraction(repeat))
+    results.update(bench_rerank(repeat))
+    results.update(bench_end_to_end(cassette, repeat))
+    return results
+
+
+def regressions(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Benchmarks more than `tolerance` times (and MIN_REGRESSION_MS) slower than the baseline."""
+    slower = []
+    for name, ms in results.items():
+        base = baseline.get(name)
+        if base is not None and ms > base * tolerance and ms - base > MIN_REGRESSION_MS:
+            slower.append(f"{name}: {ms:.2f} ms vs baseline {base:.2f} ms")
+    return slower
+
+
+# Benchmarks of the search pipeline, replayed offline from a cassette (benchmarks/cassette.json.gz by default):
+#   python bench.py --check benchmarks/baseline.json --tolerance 1.5
+#   python bench.py bench.json.gz --record                 (live: needs OPENAI_API_KEY and network)
+#   python bench.py bench.json.gz --save-baseline bench_baseline.json
+#   python bench.py --record --offline && python bench.py --save-baseline benchmarks/baseline.json
+#                                                          (re-record the committed files from a fresh process)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cassette", nargs="?", default=DEFAULT_CASSETTE)
+    parser.add_argument("--record", action="store_true", help="record the cassette from live services")
+    parser.add_argument("--offline", action="store_true",
+                        help="with --record, record from the saved pages and offline fakes instead")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--check", metavar="BASELINE", help="exit with status 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    if args.record:
+        if args.offline and os.path.exists(args.cassette):
+            os.remove(args.cassette)
+        cassette = Cassette(args.cassette, mode="record")
+        record(cassette, offline=args.offline)
+        print({kind: len(entries) for kind, entries in cassette.entries.items()})
+        sys.exit()
+
+    results = run_benchmarks(Cassette(args.cassette), args.repeat)
+    for name, ms in results.items():
+        print(f"{name:<14} {ms:10.3f} ms")
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.check:
+        with open(args.check) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for line in slower:
+            print("REGRESSION", line)
+        sys.exit(1 if slower else 0)
@@ -0,0 +1,223 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from tracing import incr
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different spellings share a cache entry."""
+    return ' '.join(query.lower().split())
+
+
+def search_cache_key(rephrased_query: str, min_price, max_price, pages: int) -> Tuple:
+    """Key of a scrape of `pages` result pages; a deeper scrape is a different answer."""
+    return (normalize_query(rephrased_query), min_price, max_price, pages)
+
+
+class SQLiteStore:
+    """
+    On-disk cache tier that survives restarts. Values are stored as JSON
+    together with the time they were written.
+    """
+
+    def __init__(self, path: str, table: str = "cache"):
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: float):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), stored_at),
+            )
+
+
+class TTLCache:
+    """
+    In-process LRU cache with a TTL, an optional SQLite tier and
+    stale-while-revalidate.
+
+    Entries younger than `ttl` are served as-is. Entries older than `ttl` but
+    younger than `ttl + stale_ttl` are served immediately while a background
+    thread refreshes them. Older entries are treated as misses.
+
+    Args:
+        maxsize (int): Maximum number of in-memory entries before LRU eviction
+        ttl (float): Seconds an entry stays fresh
+        stale_ttl (float): Extra seconds a stale entry may be served while refreshing
+        disk_path (str): SQLite file for the persistent tier, disabled when None
+        name (str): Table name in the SQLite file
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, stale_ttl: float = 0,
+                 disk_path: Optional[str] = None, name: str = "cache"):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.disk = SQLiteStore(disk_path, name) if disk_path else None
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+                      "evictions": 0, "refreshes": 0}
+
+    @staticmethod
+    def _disk_key(key: Hashable) -> str:
+        return json.dumps(key)
+
+    def _lookup(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                return entry
+        if self.disk is not None:
+            entry = self.disk.get(self._disk_key(key))
+            if entry is not None:
+                self._store(key, entry[0], entry[1])
+                self.stats["disk_hits"] += 1
+                return entry
+        return None
+
+    def _store(self, key: Hashable, value: Any, stored_at: float):
+        with self._lock:
+            self._data[key] = (value, stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+                incr("shoppin_cache_events_total", cache=self.name, result="eviction")
+
+    def set(self, key: Hashable, value: Any):
+        stored_at = time.time()
+        self._store(key, value, stored_at)
+        if self.disk is not None:
+            self.disk.set(self._disk_key(key), value, stored_at)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value or None, without refreshing."""
+        entry = self._lookup(key)
+        if entry is not None and time.time() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Any]):
+        try:
+            value = fetch()
+            if value:
+                self.set(key, value)
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            logger.warning("Background refresh failed for %s: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def lookup(self, key: Hashable, refresh: Callable[[], Any]) -> Tuple[Any, Optional[Future]]:
+        """
+        The lookup half of get_or_fetch(), for callers that produce a missing value themselves.
+
+        Returns (value, None) on a fresh hit, on a stale hit (refresh() is then
+        run in the background) and after waiting for a concurrent fill of the
+        same key. On a miss returns (None, future): the caller owns the fill and
+        must hand the future back to complete(), with the value or the error.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                incr("shoppin_cache_events_total", cache=self.name, result="hit")
+                return value, None
+            if age < self.ttl + self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                incr("shoppin_cache_events_total", cache=self.name, result="stale_hit")
+                with self._lock:
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    threading.Thread(target=self._refresh, args=(key, refresh), daemon=True).start()
+                return value, None
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            self.stats["coalesced"] += 1
+            incr("shoppin_cache_events_total", cache=self.name, result="coalesced")
+            return pending.result(), None
+
+        self.stats["misses"] += 1
+        incr("shoppin_cache_events_total", cache=self.name, result="miss")
+        return None, pending
+
+    def complete(self, key: Hashable, pending: Future, value: Any = None, error: Optional[BaseException] = None,
+                 store: bool = True):
+        """
+        Finish a fill started by lookup(): waiters get the value (or the error) and a
+        non-empty value is stored unless `store` is False, e.g. for partial results.
+        """
+        try:
+            if error is not None:
+                pending.set_exception(error)
+                return
+            if value and store:
+                self.set(key, value)
+            pending.set_result(value)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, calling fetch() on a miss.
+
+        Empty results (None, [] or {}) are returned but never stored, so a
+        blocked scrape is retried on the next call instead of being cached.
+        Concurrent misses on the same key share a single fetch() call.
+        """
+        value, pending = self.lookup(key, fetch)
+        if pending is None:
+            return value
+        try:
+            value = fetch()
+        except BaseException as e:
+            self.complete(key, pending, error=e)
+            raise
+        self.complete(key, pending, value)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def info(self) -> Dict[str, int]:
+        return dict(self.stats, size=len(self._data), maxsize=self.maxsize)
@@ -0,0 +1,138 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from products import ProductBatch
+from query_parser import FILLER_WORDS, extract_price_range
+from rerank import cosine_scores, top_k_indices
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Words left over from price phrasing and conversational queries, which product titles don't contain.
+# Words that can be part of a brand or product name ('Nothing', 'New Balance', 'Pro Max') are kept.
+SEARCH_STOPWORDS = FILLER_WORDS | {
+    'under', 'below', 'above', 'between', 'and', 'or', 'around', 'about', 'upto', 'less', 'than', 'within',
+    'least', 'cheap', 'cheapest', 'affordable', 'k', 'thousand', 'lakh', 'lakhs', 'my',
+}
+
+
+def search_terms(query: str) -> List[str]:
+    """Words of a query worth matching against titles: price phrases, filler words and bare amounts are dropped."""
+    text = query.lower()
+    _, _, price_span = extract_price_range(text)
+    if price_span is not None:
+        text = text[:price_span[0]] + ' ' + text[price_span[1]:]
+    return [token for token in TOKEN_PATTERN.findall(text)
+            if token not in SEARCH_STOPWORDS and not (token.isdigit() and len(token) >= 4)]
+
+
+class ProductCatalog:
+    """
+    Local ASIN-keyed product catalog fed by every scrape.
+
+    Products live in SQLite with an index on price for range filters and a
+    Porter-stemmed FTS5 index over titles for text search, so 'smartphones'
+    matches 'Smartphone'. Each upsert records `last_seen`,
+    so callers can ask for fresh results only and fall back to a network
+    fetch when the catalog has too few.
+
+    Args:
+        path (str): SQLite file, in-memory when None
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS products ("
+                " asin TEXT PRIMARY KEY, title TEXT, price INTEGER, data TEXT, last_seen REAL);"
+                "CREATE INDEX IF NOT EXISTS products_price ON products (price);"
+                "CREATE VIRTUAL TABLE IF NOT EXISTS product_terms"
+                " USING fts5(asin UNINDEXED, title, tokenize='porter unicode61');"
+            )
+
+    def upsert(self, products: List[Dict], seen_at: Optional[float] = None):
+        """Insert or refresh products; entries without an ASIN are skipped."""
+        seen_at = seen_at or time.time()
+        rows = [(p['asin'], p['title'], p['price'], json.dumps(p, ensure_ascii=False), seen_at)
+                for p in products if p.get('asin') and p['asin'] != 'N/A']
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM product_terms WHERE asin = ?", [(row[0],) for row in rows])
+            self._conn.executemany("INSERT INTO product_terms (asin, title) VALUES (?, ?)",
+                                   [(row[0], row[1]) for row in rows])
+
+    def get(self, asin: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM products WHERE asin = ?", (asin,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(self, query: str, min_price=None, max_price=None, limit: int = 20,
+               max_age: Optional[float] = None, embedding_store=None) -> List[Dict]:
+        """
+        Find catalog products for a query within a price range.
+
+        Args:
+            query (str): Search text; every word left by search_terms() must appear
+                in the title, up to stemming
+            min_price : Minimum price in INR
+            max_price : Maximum price in INR
+            limit (int): Maximum number of products to return
+            max_age (float): Only products seen within this many seconds
+            embedding_store: When given, title matches are ordered by semantic
+                similarity to the query instead of by BM25 rank. Products are embedded
+                as ProductBatch.texts(), so the rerank that follows reuses the vectors
+
+        Returns:
+            List[Dict]: Matching products, best first
+        """
+        tokens = search_terms(query)
+        if not tokens:
+            return []
+        conditions = ["product_terms MATCH ?"]
+        params: list = [" ".join(f'"{token}"' for token in tokens)]
+        if min_price is not None:
+            conditions.append("p.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("p.price <= ?")
+            params.append(max_price)
+        if max_age is not None:
+            conditions.append("p.last_seen >= ?")
+            params.append(time.time() - max_age)
+        # Over-fetch when reordering semantically, BM25 only shortlists
+        params.append(limit * 4 if embedding_store is not None else limit)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.data FROM product_terms JOIN products p ON p.asin = product_terms.asin "
+                f"WHERE {' AND '.join(conditions)} ORDER BY bm25(product_terms) LIMIT ?",
+                params,
+            ).fetchall()
+        products = [json.loads(row[0]) for row in rows]
+
+        if embedding_store is not None and products:
+            vectors = embedding_store.embed([query] + ProductBatch.from_dicts(products).texts())
+            order = top_k_indices(cosine_scores(vectors[0], vectors[1:]), limit)
+            products = [products[i] for i in order]
+        return products[:limit]
+
+    def price_range(self, min_price=None, max_price=None, limit: int = 100) -> List[Dict]:
+        """Cheapest products within a price range, served straight from the price index."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM products WHERE price >= ? AND price <= ? ORDER BY price LIMIT ?",
+                (min_price if min_price is not None else 0,
+                 max_price if max_price is not None else 2 ** 63 - 1, limit),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
@@ -0,0 +1,160 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+from tracing import gauge, incr
+
+
+def trim_messages(messages: list, max_messages: int) -> list:
+    """
+    Keep the last max_messages messages, starting the window at a user message
+    so a tool result is never separated from the tool call that produced it.
+    """
+    if len(messages) <= max_messages:
+        return messages
+    kept = messages[-max_messages:]
+    for i, message in enumerate(kept):
+        if getattr(message, "type", None) == "human":
+            return kept[i:]
+    return kept
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer with bounded memory.
+
+    Threads are evicted least recently used first once there are more than
+    `max_threads`, only the last `max_checkpoints` checkpoints of a thread are
+    kept, and a thread's message history is trimmed to `max_messages`. With a
+    `db_path` the latest checkpoint of every thread is also written to SQLite
+    (in the serializer's msgpack encoding), so evicted threads and threads
+    from before a restart are loaded back on their next turn.
+
+    Args:
+        max_threads (int): Threads kept in memory
+        max_checkpoints (int): Checkpoints kept per thread and namespace
+        max_messages (int): Messages kept in a thread's history
+        db_path (str): SQLite file for persistence, memory only when None
+    """
+
+    def __init__(self, max_threads: int = 1000, max_checkpoints: int = 2, max_messages: int = 40,
+                 db_path: Optional[str] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.max_checkpoints = max_checkpoints
+        self.max_messages = max_messages
+        self.evictions = 0
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS checkpoints (thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, "
+                    "checkpoint_type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB, parent_id TEXT, "
+                    "PRIMARY KEY (thread_id, checkpoint_ns))"
+                )
+
+    def _touch(self, thread_id: str):
+        self._recent[thread_id] = None
+        self._recent.move_to_end(thread_id)
+        while len(self._recent) > self.max_threads:
+            evicted, _ = self._recent.popitem(last=False)
+            self._drop_thread(evicted)
+            self.evictions += 1
+            incr("shoppin_checkpoint_evictions_total")
+
+    def _drop_thread(self, thread_id: str):
+        self.storage.pop(thread_id, None)
+        for key in [key for key in self.writes if key[0] == thread_id]:
+            del self.writes[key]
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints:
+            return
+        for checkpoint_id in sorted(checkpoints)[:-self.max_checkpoints]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _load_thread(self, thread_id: str):
+        rows = self._db.execute(
+            "SELECT checkpoint_ns, checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata, parent_id "
+            "FROM checkpoints WHERE thread_id = ?", (thread_id,)
+        ).fetchall()
+        for ns, checkpoint_id, c_type, c_blob, m_type, m_blob, parent_id in rows:
+            self.storage[thread_id][ns][checkpoint_id] = ((c_type, c_blob), (m_type, m_blob), parent_id)
+
+    def _persist(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+        (c_type, c_blob), (m_type, m_blob), parent_id = self.storage[thread_id][checkpoint_ns][checkpoint_id]
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, c_type, c_blob, m_type, m_blob, parent_id),
+            )
+
+    def _trim(self, checkpoint: Checkpoint) -> Checkpoint:
+        messages = checkpoint["channel_values"].get("messages")
+        if not isinstance(messages, list) or len(messages) <= self.max_messages:
+            return checkpoint
+        trimmed = checkpoint.copy()
+        trimmed["channel_values"] = {**checkpoint["channel_values"],
+                                     "messages": trim_messages(messages, self.max_messages)}
+        return trimmed
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id not in self.storage and self._db is not None:
+                self._load_thread(thread_id)
+            result = super().get_tuple(config)
+            if any(self.storage.get(thread_id, {}).values()):
+                self._touch(thread_id)
+            else:
+                # get_tuple's defaultdict lookup leaves an empty entry behind for unknown threads
+                self.storage.pop(thread_id, None)
+            return result
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            next_config = super().put(config, self._trim(checkpoint), metadata, new_versions)
+            self._prune(thread_id, checkpoint_ns)
+            if self._db is not None:
+                self._persist(thread_id, checkpoint_ns, checkpoint["id"])
+            self._touch(thread_id)
+            self._report()
+            return next_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the serialized checkpoints and pending writes held in memory."""
+        with self._lock:
+            total = 0
+            for namespaces in self.storage.values():
+                for checkpoints in namespaces.values():
+                    for (_, checkpoint), (_, metadata), _ in checkpoints.values():
+                        total += len(checkpoint) + len(metadata)
+            for writes in self.writes.values():
+                for _, _, (_, value), _ in writes.values():
+                    total += len(value)
+            return total
+
+    def stats(self) -> Dict[str, int]:
+        return {"threads": len(self.storage), "memory_bytes": self.memory_bytes(), "evictions": self.evictions}
+
+    def _report(self):
+        gauge("shoppin_checkpoint_threads", len(self.storage))
+        gauge("shoppin_checkpoint_memory_bytes", self.memory_bytes())
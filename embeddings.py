@@ -0,0 +1,223 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MODEL = "text-embedding-3-small"
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+class OpenAIEmbeddings:
+    """Embedding provider backed by the OpenAI embeddings endpoint; a client is created on first use when none is given."""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def __call__(self, texts: List[str], model: str) -> List[List[float]]:
+        data = self.client.embeddings.create(input=texts, model=model).data
+        return [item.embedding for item in data]
+
+
+class HashingEmbeddings:
+    """
+    Deterministic offline embedding provider. Tokens are hashed into `dim`
+    signed buckets, so texts sharing words get similar vectors without any
+    network call.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.calls = 0
+
+    def __call__(self, texts: List[str], model: str) -> List[List[float]]:
+        self.calls += 1
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                digest = hashlib.md5(token.encode()).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+            norm = np.linalg.norm(vectors[row])
+            if norm:
+                vectors[row] /= norm
+        return vectors.tolist()
+
+
+def content_key(text: str, model: str) -> str:
+    return hashlib.sha1(f"{model}\0{text}".encode()).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Embedding cache keyed by content hash and model name.
+
+    Vectors are float32 rows appended to '<path>.f32', and an SQLite index
+    '<path>.db' maps keys to rows. Rows are allocated in an SQLite write
+    transaction that commits only after the vectors are written, so processes
+    sharing a path never reuse each other's rows nor see a key before its
+    vector. Without a path the store lives in memory only. Every embed() call
+    sends only the cache misses to the provider, as one deduplicated batch.
+
+    Args:
+        provider: Callable (texts, model) -> list of vectors
+        path (str): File prefix for the persistent store, in-memory when None
+        model (str): Embedding model name, part of every key
+        capacity (int): Initial number of rows of the in-memory buffer, doubled when full
+    """
+
+    def __init__(self, provider, path: Optional[str] = None, model: str = DEFAULT_MODEL,
+                 capacity: int = 1024):
+        self.provider = provider
+        self.path = path
+        self.model = model
+        self.capacity = capacity
+        # Rows of the keys this process has looked up or added so far
+        self.index: Dict[str, int] = {}
+        self.vectors: Optional[np.ndarray] = None
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "requests": 0}
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._conn = sqlite3.connect(f"{path}.db" if path is not None else ":memory:", timeout=60,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);"
+            "CREATE TABLE IF NOT EXISTS embeddings (row INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL);"
+        )
+        self.dim: Optional[int] = self._stored_dim()
+
+    def _stored_dim(self) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return row[0] if row else None
+
+    def _lookup(self, keys: List[str]):
+        """Load the rows of keys added since this process last looked, by it or by another one."""
+        unknown = list({key for key in keys if key not in self.index})
+        for start in range(0, len(unknown), 500):
+            chunk = unknown[start:start + 500]
+            self.index.update(self._conn.execute(
+                f"SELECT key, row FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ))
+
+    def _write(self, row: int, vectors: np.ndarray):
+        """Write vectors from `row` on, growing the in-memory buffer or the vector file."""
+        if self.path is None:
+            needed = row + len(vectors)
+            if self.vectors is None or needed > len(self.vectors):
+                capacity = max(self.capacity, 1)
+                while capacity < needed:
+                    capacity *= 2
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                if self.vectors is not None:
+                    grown[:len(self.vectors)] = self.vectors
+                self.vectors, self.capacity = grown, capacity
+            self.vectors[row:needed] = vectors
+        else:
+            fd = os.open(f"{self.path}.f32", os.O_RDWR | os.O_CREAT)
+            try:
+                os.pwrite(fd, np.ascontiguousarray(vectors, dtype=np.float32).tobytes(), row * self.dim * 4)
+            finally:
+                os.close(fd)
+
+    def _read(self, rows: List[int]) -> np.ndarray:
+        if self.path is not None and (self.vectors is None or max(rows) >= len(self.vectors)):
+            # Map the file as far as it has grown, including rows written by other processes
+            count = os.path.getsize(f"{self.path}.f32") // (self.dim * 4)
+            self.vectors = np.memmap(f"{self.path}.f32", dtype=np.float32, mode='r', shape=(count, self.dim))
+        return np.array(self.vectors[rows])
+
+    def _add(self, keys: List[str], vectors: np.ndarray):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # The first vectors stored fix the dimension, possibly in another process
+            self.dim = self._stored_dim()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._conn.execute("INSERT INTO meta VALUES ('dim', ?)", (self.dim,))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+            # Rows are never deleted, so the rows allocated here are consecutive; keys another
+            # process added in the meantime keep its vectors
+            first, added = None, []
+            for key, vector in zip(keys, vectors):
+                cursor = self._conn.execute("INSERT OR IGNORE INTO embeddings (key) VALUES (?)", (key,))
+                if cursor.rowcount:
+                    first = cursor.lastrowid if first is None else first
+                    added.append(vector)
+            if added:
+                self._write(first, np.stack(added))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._lookup(keys)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Return a float32 matrix with one embedding row per text, embedding only unseen texts.
+
+        The provider is called without holding the store lock, so concurrent
+        callers embed in parallel; a text already being embedded by another
+        caller is waited for instead of being sent twice.
+        """
+        keys = [content_key(text, self.model) for text in texts]
+        with self._lock:
+            self._lookup(keys)
+            missing, waiting = {}, {}
+            for key, text in zip(keys, texts):
+                if key in self.index or key in missing or key in waiting:
+                    continue
+                pending = self._inflight.get(key)
+                if pending is not None:
+                    waiting[key] = pending
+                else:
+                    missing[key] = text
+                    self._inflight[key] = Future()
+            owned = {key: self._inflight[key] for key in missing}
+
+            self.stats["hits"] += len(texts) - len(missing) - len(waiting)
+            self.stats["misses"] += len(missing)
+            self.stats["coalesced"] += len(waiting)
+            if missing:
+                self.stats["requests"] += 1
+
+        if missing:
+            try:
+                vectors = np.asarray(self.provider(list(missing.values()), self.model), dtype=np.float32)
+                with self._lock:
+                    self._add(list(missing.keys()), vectors)
+            except BaseException as e:
+                for pending in owned.values():
+                    pending.set_exception(e)
+                raise
+            else:
+                for pending in owned.values():
+                    pending.set_result(None)
+            finally:
+                with self._lock:
+                    for key in missing:
+                        del self._inflight[key]
+        for pending in waiting.values():
+            pending.result()
+
+        with self._lock:
+            if not texts:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            return self._read([self.index[key] for key in keys])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
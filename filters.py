@@ -0,0 +1,67 @@
+from typing import Dict, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from products import ProductBatch
+
+
+class ProductFilters(BaseModel):
+    min_rating: float = Field(default=0.0, description="Drop products rated below this many stars.")
+    min_reviews: int = Field(default=0, description="Drop products with fewer reviews than this.")
+    prime_only: bool = Field(default=False, description="Drop products that aren't Prime eligible.")
+
+
+def filter_masks(batch: ProductBatch, min_price=None, max_price=None,
+                 filters: ProductFilters = None) -> Dict[str, np.ndarray]:
+    """
+    Boolean keep-mask per filter, only for the filters that are active.
+
+    Products without a parsed price (0) are dropped whenever a price bound is set,
+    since there's no telling whether they are in range.
+    """
+    filters = filters or ProductFilters()
+    prices = batch.price
+    masks = {}
+    if min_price is not None or max_price is not None:
+        masks["unpriced"] = prices > 0
+    if min_price is not None:
+        masks["min_price"] = prices >= min_price
+    if max_price is not None:
+        masks["max_price"] = prices <= max_price
+    if filters.min_rating:
+        masks["min_rating"] = batch.rating >= filters.min_rating
+    if filters.min_reviews:
+        masks["min_reviews"] = batch.reviews >= filters.min_reviews
+    if filters.prime_only:
+        masks["prime_only"] = batch.is_prime
+    return masks
+
+
+def filter_products(batch: ProductBatch, min_price=None, max_price=None,
+                    filters: ProductFilters = None) -> Tuple[ProductBatch, Dict[str, int]]:
+    """
+    Keep the products that pass every active filter.
+
+    Filters are applied in order and each is charged only with the products
+    that survived the ones before it, so the drop counts add up to the total
+    number of products removed.
+
+    Args:
+        batch (ProductBatch): Candidate products
+        min_price : Minimum price in INR
+        max_price : Maximum price in INR
+        filters (ProductFilters): Rating, review and Prime filters
+
+    Returns:
+        Tuple[ProductBatch, Dict[str, int]]: Kept products in their original order and
+            the number of products each filter dropped
+    """
+    keep = np.ones(len(batch), dtype=bool)
+    dropped = {}
+    for name, mask in filter_masks(batch, min_price, max_price, filters).items():
+        dropped[name] = int(np.count_nonzero(keep & ~mask))
+        keep &= mask
+    if keep.all():
+        return batch, dropped
+    return batch[keep], dropped
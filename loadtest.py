@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from replay import OfflineChatModel
+from serving import stream_reply
+
+STUB_PRODUCTS = [
+    {
+        'title': f'Stub product {i}', 'asin': f'B0STUB{i:04d}', 'link': f'https://www.amazon.in/dp/B0STUB{i:04d}',
+        'currency': '₹', 'price': 10000 + 1000 * i, 'rating': 4.0, 'reviews': 100 * i, 'featured_image': 'N/A',
+        'is_prime': bool(i % 2), 'is_best_seller': False, 'is_amazon_choice': False,
+    }
+    for i in range(5)
+]
+
+
+def build_stub_graph(llm_latency: float = 0.5, scrape_latency: float = 1.0):
+    """The production agent wiring with a stubbed LLM and a stubbed, blocking search tool."""
+
+    @tool
+    def get_top_5_products(query: str) -> list:
+        """Return top 5 products available on amazon according to the query."""
+        time.sleep(scrape_latency)
+        return STUB_PRODUCTS
+
+    return create_react_agent(OfflineChatModel(latency=llm_latency), tools=[get_top_5_products],
+                              checkpointer=MemorySaver())
+
+
+async def simulate_user(graph, user: int, turns: int, latencies: List[float]):
+    thread_id = f"user-{user}"
+    for turn in range(turns):
+        start = time.perf_counter()
+        async for _ in stream_reply(graph, f"phone under {10000 + turn * 1000}", thread_id):
+            pass
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_load(graph, users: int, turns: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(simulate_user(graph, user, turns, latencies) for user in range(users)))
+    elapsed = time.perf_counter() - start
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+# Load test of the async serving path with stubbed LLM and scraper backends:
+#   python loadtest.py --users 1 10 100 --turns 3
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--scrape-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    graph = build_stub_graph(args.llm_latency, args.scrape_latency)
+    for users in args.users:
+        result = asyncio.run(run_load(graph, users, args.turns))
+        print(f"{result['users']:>4} users  {result['requests']:>5} requests  "
+              f"p50 {result['p50']:.2f}s  p99 {result['p99']:.2f}s  {result['throughput']:.1f} req/s")
@@ -1,16 +1,53 @@
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
-from tools import get_top_5_products
 import os
+import threading
 
-model = ChatOpenAI(model="gpt-4o", temperature=0, api_key=os["OPENAI_API_KEY"])
+# The agent is built on first use by get_graph() rather than at import, so a
+# worker can bind its port before paying for langchain, langgraph and openai.
+_graph = None
+_graph_lock = threading.Lock()
 
 
-tools = [get_top_5_products]
+def build_graph():
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import create_react_agent
+    from checkpoint import BoundedMemorySaver
+    from tools import get_top_5_products
 
-memory = MemorySaver()
+    model = ChatOpenAI(model="gpt-4o", temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
 
-graph = create_react_agent(
-    model, tools=tools, checkpointer=memory
-)
\ No newline at end of file
+    tools = [get_top_5_products]
+
+    # Bounded conversation memory; set SHOPPIN_CHECKPOINT_PATH to keep threads across restarts
+    memory = BoundedMemorySaver(
+        max_threads=int(os.getenv("SHOPPIN_MAX_THREADS", 1000)),
+        max_messages=int(os.getenv("SHOPPIN_MAX_MESSAGES", 40)),
+        db_path=os.getenv("SHOPPIN_CHECKPOINT_PATH"),
+    )
+
+    return create_react_agent(
+        model, tools=tools, checkpointer=memory
+    )
+
+
+def get_graph():
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
+
+
+def warm_up():
+    """Build the agent and open the outbound connection pools, so the first chat turn doesn't pay for them."""
+    import tools
+
+    get_graph()
+    tools.warm_up()
+
+
+def __getattr__(name):
+    # `from main import graph` still works, building the agent on first access
+    if name == "graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import math
+import os
+import re
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from amazon_scrapper.fetcher import Fetcher, get_fetcher, run_sync
+from amazon_scrapper.marketplace import Marketplace, MarketplaceUnavailable
+from amazon_scrapper.scrapper import AmazonIndia
+from tracing import incr, span
+
+logger = logging.getLogger(__name__)
+
+# Listings on different marketplaces whose normalized titles match and whose INR
+# prices are at most this far apart are treated as the same product when merged
+PRICE_TOLERANCE = 10
+
+TITLE_NOISE_PATTERN = re.compile(r'[^\w]+')
+
+
+# Available marketplaces by name, see register_marketplace()
+MARKETPLACES: Dict[str, Marketplace] = {}
+
+
+def register_marketplace(marketplace: Marketplace):
+    MARKETPLACES[marketplace.name] = marketplace
+
+
+register_marketplace(AmazonIndia())
+
+# Comma separated names of the marketplaces every search fans out to
+ENABLED_MARKETPLACES = [name.strip() for name in os.getenv("SHOPPIN_MARKETPLACES", "amazon.in").split(",")
+                        if name.strip()]
+
+# Seconds a search waits for the marketplaces; products that arrived in time are ranked, the rest is
+# dropped. math.inf waits for every marketplace.
+SEARCH_DEADLINE = float(os.getenv("SHOPPIN_SEARCH_DEADLINE", 8.0))
+
+
+def enabled_marketplaces() -> List[Marketplace]:
+    unknown = [name for name in ENABLED_MARKETPLACES if name not in MARKETPLACES]
+    if unknown:
+        raise ValueError(f"Unknown marketplaces {unknown}, registered: {sorted(MARKETPLACES)}")
+    return [MARKETPLACES[name] for name in ENABLED_MARKETPLACES]
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase the title and reduce punctuation and whitespace runs to single spaces."""
+    return TITLE_NOISE_PATTERN.sub(' ', title.lower()).strip()
+
+
+def is_duplicate_listing(product: Dict, marketplace: str, seen: Dict[str, List[Tuple[str, int]]]) -> bool:
+    """
+    Whether a product was already listed by another marketplace under the same
+    normalized title within PRICE_TOLERANCE; otherwise it is added to `seen`,
+    which maps normalized titles to (marketplace, price) pairs. Listings of one
+    marketplace are never merged with each other, same-priced variants included.
+    """
+    listings = seen.setdefault(normalize_title(product['title']), [])
+    if any(other != marketplace and abs(price - product['price']) <= PRICE_TOLERANCE for other, price in listings):
+        return True
+    listings.append((marketplace, product['price']))
+    return False
+
+
+async def stream_marketplaces(search_query: str, min_price, max_price, n: int = 20, pages: int = 1,
+                              deadline: Optional[float] = None, marketplaces: Optional[List[Marketplace]] = None,
+                              fetcher: Optional[Fetcher] = None,
+                              missing: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+    """
+    Search every marketplace concurrently and yield products as they arrive,
+    dropping listings another marketplace already yielded (see is_duplicate_listing).
+
+    Args:
+        search_query (str): Product to search for
+        min_price : Minimum price in INR
+        max_price : Maximum price in INR
+        n (int): Maximum number of products per marketplace
+        pages (int): Result pages fetched per marketplace
+        deadline (float): Seconds until the marketplaces still searching are abandoned, SEARCH_DEADLINE by default
+        marketplaces (List[Marketplace]): Marketplaces to search, the enabled ones by default
+        fetcher (Fetcher): Fetcher to use, defaults to the shared one of the running loop
+        missing (List[str]): When given, the names of the marketplaces that failed or
+            were cut off by the deadline are appended to it once the stream ends;
+            the search was complete when it stays empty
+
+    Yields:
+        Dict: Products priced in INR, in arrival order across marketplaces
+    """
+    marketplaces = enabled_marketplaces() if marketplaces is None else marketplaces
+    fetcher = fetcher or get_fetcher()
+    deadline = SEARCH_DEADLINE if deadline is None else deadline
+    loop = asyncio.get_running_loop()
+    end = None if math.isinf(deadline) else loop.time() + deadline
+    arrivals: asyncio.Queue = asyncio.Queue()
+    finished = object()
+    failed = []
+
+    async def search(marketplace: Marketplace):
+        try:
+            with span("marketplace", marketplace=marketplace.name) as marketplace_span:
+                count = 0
+                async for product in marketplace.stream(search_query, min_price, max_price, n, pages, fetcher):
+                    arrivals.put_nowait((marketplace.name, product))
+                    count += 1
+                marketplace_span.set(products=count)
+        except MarketplaceUnavailable as e:
+            logger.warning("%s", e)
+            failed.append(marketplace.name)
+        except Exception:
+            # A broken plugin costs its own results, not the answer
+            logger.exception("Searching %s failed", marketplace.name)
+            failed.append(marketplace.name)
+        finally:
+            arrivals.put_nowait(finished)
+
+    tasks = {asyncio.create_task(search(marketplace)): marketplace for marketplace in marketplaces}
+    running = len(tasks)
+    seen: Dict[str, List[Tuple[str, int]]] = {}
+    try:
+        while running:
+            try:
+                arrival = await asyncio.wait_for(arrivals.get(), None if end is None else end - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if arrival is finished:
+                running -= 1
+                continue
+            name, product = arrival
+            if is_duplicate_listing(product, name, seen):
+                incr("shoppin_marketplace_duplicates_total")
+                continue
+            yield product
+
+        if missing is not None:
+            missing.extend(failed)
+        for task, marketplace in tasks.items():
+            if not task.done():
+                if missing is not None:
+                    missing.append(marketplace.name)
+                incr("shoppin_marketplace_timeouts_total", marketplace=marketplace.name)
+                logger.warning("%s missed the %.1fs search deadline", marketplace.name, deadline)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def search_marketplaces(search_query: str, min_price, max_price, n: int = 20, pages: int = 1,
+                        deadline: Optional[float] = None,
+                        marketplaces: Optional[List[Marketplace]] = None) -> Tuple[List[Dict], List[str]]:
+    """
+    Blocking stream_marketplaces.
+
+    Returns:
+        Tuple[List[Dict], List[str]]: The merged products that arrived before the
+        deadline, and the names of the marketplaces that failed or were cut off
+    """
+    missing = []
+
+    async def search():
+        return [product async for product in stream_marketplaces(search_query, min_price, max_price, n, pages,
+                                                                  deadline, marketplaces, missing=missing)]
+
+    return run_sync(search()), missing
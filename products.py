@@ -0,0 +1,203 @@
+import gc
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Union
+
+import numpy as np
+
+# Bits of ProductBatch.flags
+PRIME = 1
+BEST_SELLER = 2
+AMAZON_CHOICE = 4
+
+STRING_FIELDS = ('title', 'asin', 'link', 'currency', 'featured_image')
+
+
+@dataclass(slots=True)
+class Product:
+    """One search result, with the same fields as the parser's product dicts."""
+
+    title: str
+    asin: str = 'N/A'
+    link: str = 'N/A'
+    currency: str = '₹'
+    price: int = 0
+    rating: float = 0.0
+    reviews: int = 0
+    featured_image: str = 'N/A'
+    is_prime: bool = False
+    is_best_seller: bool = False
+    is_amazon_choice: bool = False
+
+    @classmethod
+    def from_dict(cls, product: Dict) -> "Product":
+        return cls(**{name: product[name] for name in cls.__slots__ if name in product})
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _intern(values: Iterable[str], count: int) -> np.ndarray:
+    column = np.empty(count, dtype=object)
+    column[:] = [sys.intern(value) for value in values]
+    return column
+
+
+class ProductBatch:
+    """
+    Products stored column-wise: int32 prices and reviews, float32 ratings,
+    a uint8 bitmask of the PRIME / BEST_SELLER / AMAZON_CHOICE badges, and
+    interned strings in object arrays.
+
+    Indexing with a slice returns a batch of views over the same columns
+    (no copy); indexing with an index array or boolean mask gathers those
+    rows, as numpy does. Integer indexing returns a Product.
+    """
+
+    __slots__ = ('title', 'asin', 'link', 'currency', 'featured_image', 'price', 'rating', 'reviews', 'flags')
+
+    def __init__(self, title: np.ndarray, asin: np.ndarray, link: np.ndarray, currency: np.ndarray,
+                 featured_image: np.ndarray, price: np.ndarray, rating: np.ndarray, reviews: np.ndarray,
+                 flags: np.ndarray):
+        self.title = title
+        self.asin = asin
+        self.link = link
+        self.currency = currency
+        self.featured_image = featured_image
+        self.price = price
+        self.rating = rating
+        self.reviews = reviews
+        self.flags = flags
+
+    @classmethod
+    def from_dicts(cls, products: List[Dict]) -> "ProductBatch":
+        count = len(products)
+        strings = {name: _intern((p.get(name, 'N/A') for p in products), count) for name in STRING_FIELDS}
+        flags = np.fromiter(
+            (p['is_prime'] * PRIME | p['is_best_seller'] * BEST_SELLER | p['is_amazon_choice'] * AMAZON_CHOICE
+             for p in products),
+            dtype=np.uint8, count=count,
+        )
+        return cls(
+            price=np.fromiter((p['price'] for p in products), dtype=np.int32, count=count),
+            rating=np.fromiter((p['rating'] for p in products), dtype=np.float32, count=count),
+            reviews=np.fromiter((p['reviews'] for p in products), dtype=np.int32, count=count),
+            flags=flags,
+            **strings,
+        )
+
+    @classmethod
+    def from_products(cls, products: List[Product]) -> "ProductBatch":
+        return cls.from_dicts([product.to_dict() for product in products])
+
+    @property
+    def is_prime(self) -> np.ndarray:
+        return (self.flags & PRIME).astype(bool)
+
+    @property
+    def is_best_seller(self) -> np.ndarray:
+        return (self.flags & BEST_SELLER).astype(bool)
+
+    @property
+    def is_amazon_choice(self) -> np.ndarray:
+        return (self.flags & AMAZON_CHOICE).astype(bool)
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def __getitem__(self, index) -> Union[Product, "ProductBatch"]:
+        if isinstance(index, (int, np.integer)):
+            return Product(**self._row(index))
+        return ProductBatch(*(getattr(self, name)[index] for name in self.__slots__))
+
+    def _row(self, i: int) -> Dict:
+        flags = int(self.flags[i])
+        # Ratings have one decimal; rounding undoes the float32 representation error (4.3 -> 4.300000190734863)
+        return {
+            'title': self.title[i], 'asin': self.asin[i], 'link': self.link[i], 'currency': self.currency[i],
+            'price': int(self.price[i]), 'rating': round(float(self.rating[i]), 1), 'reviews': int(self.reviews[i]),
+            'featured_image': self.featured_image[i], 'is_prime': bool(flags & PRIME),
+            'is_best_seller': bool(flags & BEST_SELLER), 'is_amazon_choice': bool(flags & AMAZON_CHOICE),
+        }
+
+    def to_dicts(self) -> List[Dict]:
+        """Product dicts in the parser's format, for the tool output."""
+        return [self._row(i) for i in range(len(self))]
+
+    def texts(self) -> List[str]:
+        """The text embedded for each product."""
+        return [f"{title} | {price} | Rating: {round(rating, 1)} | Reviews: {reviews}"
+                for title, price, rating, reviews in zip(self.title, self.price.tolist(),
+                                                         self.rating.tolist(), self.reviews.tolist())]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the numeric columns and the string column pointers (the strings themselves are shared)."""
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+
+def benchmark_products(count: int = 100_000, distinct_titles: int = 5_000) -> Dict[str, Dict[str, float]]:
+    """
+    Memory (traced MB) and time (ms) to build, filter on price and rating, and
+    convert `count` products as a list of dicts and as a ProductBatch.
+    """
+    rng = np.random.default_rng(0)
+    prices = rng.integers(100, 200_000, count).tolist()
+    ratings = np.round(rng.uniform(0, 5, count), 1).tolist()
+    reviews = rng.integers(0, 50_000, count).tolist()
+    flags = rng.integers(0, 8, count).tolist()
+
+    def raw_products():
+        # Titles are rebuilt per product, as the parser does, so interning has duplicates to share
+        return [
+            {'title': f"Product {i % distinct_titles} with a reasonably long marketing title",
+             'asin': f"B0{i:08d}", 'link': f"https://www.amazon.in/dp/B0{i:08d}", 'currency': '₹',
+             'price': prices[i], 'rating': ratings[i], 'reviews': reviews[i],
+             'featured_image': f"https://m.media-amazon.com/images/I/{i}.jpg",
+             'is_prime': bool(flags[i] & PRIME), 'is_best_seller': bool(flags[i] & BEST_SELLER),
+             'is_amazon_choice': bool(flags[i] & AMAZON_CHOICE)}
+            for i in range(count)
+        ]
+
+    def build(name):
+        products = raw_products()
+        return ProductBatch.from_dicts(products) if name == 'batch' else products
+
+    results = {}
+    for name in ('dicts', 'batch'):
+        gc.collect()
+        tracemalloc.start()
+        products = build(name)
+        memory = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        tracemalloc.stop()
+        del products
+
+        # Timed separately, tracemalloc slows allocation down; collections are paused so they don't land in one stage
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            products = build(name)
+            built = time.perf_counter()
+            if name == 'batch':
+                kept = products[(products.price >= 10_000) & (products.price <= 50_000) & (products.rating >= 4)]
+                filtered = time.perf_counter()
+                kept.to_dicts()
+            else:
+                kept = [p for p in products if 10_000 <= p['price'] <= 50_000 and p['rating'] >= 4]
+                filtered = time.perf_counter()
+                [dict(p) for p in kept]
+            done = time.perf_counter()
+        finally:
+            gc.enable()
+        results[name] = {'memory_mb': memory, 'build_ms': (built - start) * 1000,
+                         'filter_ms': (filtered - built) * 1000, 'to_dicts_ms': (done - filtered) * 1000}
+        del products, kept
+    return results
+
+
+if __name__ == "__main__":
+    for name, numbers in benchmark_products().items():
+        print(f"{name:>6}", "  ".join(f"{key}: {value:.1f}" for key, value in numbers.items()))
@@ -0,0 +1,159 @@
+import re
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+
+class QueryDetails(BaseModel):
+    rephrased_query: str = Field(description="The rephrased version of the original query.")
+    category: str = Field(description="The category inferred from the query.")
+    maximum_price: Union[int, None] = Field(default=None, description="The maximum price inferred from the query.")
+    minimum_price: Union[int, None] = Field(default=None, description="The minimum price inferred from the query.")
+
+
+class ShoppingQuery(QueryDetails):
+    is_shopping: bool = Field(description="True if the query could be about a product on an ecommerce platform.")
+
+
+# Queries parsed with at least this confidence skip the LLM
+FAST_PATH_CONFIDENCE = 0.8
+
+AMOUNT = r'(?:₹|rs\.?|inr)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|lakhs?|lacs?|l|crores?|cr)?\b'
+
+UNITS = {
+    'k': 1_000, 'thousand': 1_000,
+    'l': 100_000, 'lakh': 100_000, 'lakhs': 100_000, 'lac': 100_000, 'lacs': 100_000,
+    'cr': 10_000_000, 'crore': 10_000_000, 'crores': 10_000_000,
+}
+
+# (pattern, kind) in priority order; ranges first so 'between 50k and 80k' isn't read as two bounds
+PRICE_PATTERNS = [
+    (re.compile(rf'\bbetween\s+{AMOUNT}\s*(?:and|to|-)\s*{AMOUNT}'), 'range'),
+    (re.compile(rf'(?:\bfrom\s+)?{AMOUNT}\s*(?:-|to)\s*{AMOUNT}'), 'range'),
+    (re.compile(rf'(?:\b(?:under|below|less than|within|upto|up to|max(?:imum)?|not more than|budget(?: of| is)?)|<)\s*{AMOUNT}'), 'max'),
+    (re.compile(rf'(?:\b(?:above|over|more than|at least|atleast|min(?:imum)?|starting(?: from| at)?)|>)\s*{AMOUNT}'), 'min'),
+    (re.compile(rf'\b(?:around|about|approx(?:imately)?|near)\s+{AMOUNT}'), 'around'),
+]
+
+FILLER_WORDS = {
+    'i', 'want', 'need', 'looking', 'for', 'to', 'buy', 'a', 'an', 'the', 'me', 'show', 'suggest',
+    'please', 'find', 'some', 'good', 'best', 'top', 'price', 'priced', 'range', 'in', 'of', 'with', 'budget',
+    'can', 'you', 'recommend', 'get', 'rs', 'inr', 'rupees',
+}
+
+CATEGORIES = {
+    'Smartphones': {'phone', 'phones', 'smartphone', 'smartphones', 'mobile', 'mobiles', 'iphone'},
+    'Laptops': {'laptop', 'laptops', 'macbook', 'notebook', 'chromebook'},
+    'Tablets': {'tablet', 'tablets', 'ipad'},
+    'Headphones': {'headphone', 'headphones', 'earphones', 'earbuds', 'headset', 'airpods', 'tws'},
+    'Televisions': {'tv', 'tvs', 'television', 'televisions'},
+    'Smartwatches': {'smartwatch', 'smartwatches', 'watch', 'watches'},
+    'Cameras': {'camera', 'cameras', 'dslr', 'mirrorless'},
+    'Speakers': {'speaker', 'speakers', 'soundbar'},
+    'Monitors': {'monitor', 'monitors'},
+    'Footwear': {'shoe', 'shoes', 'sneakers', 'sandals', 'slippers'},
+    'Home Appliances': {'refrigerator', 'fridge', 'ac', 'washing', 'microwave', 'purifier', 'cooler', 'fan'},
+    'Kitchen Appliances': {'mixer', 'grinder', 'kettle', 'toaster', 'induction', 'blender'},
+}
+
+KEYWORD_CATEGORY = {word: category for category, words in CATEGORIES.items() for word in words}
+
+# Counts and cumulative latency of the rule-based and LLM extraction paths, and of
+# the individual LLM stages ("structured", "classify", "extract")
+stats = {"fast": 0, "llm": 0, "fast_seconds": 0.0, "llm_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def record_path(path: str, seconds: float):
+    with _stats_lock:
+        stats[path] = stats.get(path, 0) + 1
+        stats[f"{path}_seconds"] = stats.get(f"{path}_seconds", 0.0) + seconds
+
+
+def stage_summary() -> Dict[str, float]:
+    """Mean latency in milliseconds of every recorded path or stage."""
+    with _stats_lock:
+        return {f"{name}_ms": 1000 * stats[f"{name}_seconds"] / count
+                for name, count in stats.items() if not name.endswith("_seconds") and count}
+
+
+def path_summary() -> Dict[str, float]:
+    """Fast path hit rate and mean latency in milliseconds of each path."""
+    with _stats_lock:
+        total = stats["fast"] + stats["llm"]
+        return {
+            "fast_path_rate": stats["fast"] / total if total else 0.0,
+            "fast_ms": 1000 * stats["fast_seconds"] / stats["fast"] if stats["fast"] else 0.0,
+            "llm_ms": 1000 * stats["llm_seconds"] / stats["llm"] if stats["llm"] else 0.0,
+        }
+
+
+def to_amount(number: str, unit: Optional[str]) -> int:
+    """Convert '1.5' + 'lakh' or '20,000' + None to an amount in INR."""
+    value = float(number.replace(',', ''))
+    return int(value * UNITS.get(unit, 1)) if unit else int(value)
+
+
+def extract_price_range(query: str) -> Tuple[Optional[int], Optional[int], Optional[Tuple[int, int]]]:
+    """Return (minimum_price, maximum_price, span of the matched phrase) for the first price phrase found."""
+    for pattern, kind in PRICE_PATTERNS:
+        match = pattern.search(query)
+        if not match:
+            continue
+        amounts = [to_amount(match.group(i), match.group(i + 1)) for i in range(1, pattern.groups + 1, 2)
+                   if match.group(i)]
+        # Bare small numbers are model names ('iphone 15'), not prices
+        if any(amount < 100 for amount in amounts):
+            continue
+        if kind == 'range':
+            low, high = sorted(amounts)
+            return low, high, match.span()
+        if kind == 'max':
+            return None, amounts[0], match.span()
+        if kind == 'min':
+            return amounts[0], None, match.span()
+        return int(amounts[0] * 0.8), int(amounts[0] * 1.2), match.span()
+    return None, None, None
+
+
+def extract_query_details(query: str) -> Tuple[Optional[QueryDetails], float]:
+    """
+    Deterministically extract query details from common Indian price phrasing.
+
+    Args:
+        query (str): User query such as 'phone under 20000' or 'laptop between 50k and 80k'
+
+    Returns:
+        Tuple[Optional[QueryDetails], float]: Parsed details (None when no price was found)
+        and a confidence in [0, 1]. Below FAST_PATH_CONFIDENCE the LLM should be used.
+    """
+    text = query.lower().replace('₹', ' ₹')
+    min_price, max_price, span = extract_price_range(text)
+    if span is None:
+        return None, 0.0
+
+    remainder = text[:span[0]] + ' ' + text[span[1]:]
+    words = [word for word in re.findall(r"[a-z0-9][a-z0-9+.'-]*", remainder) if word not in FILLER_WORDS]
+    if not words:
+        return None, 0.0
+
+    confidence = 1.0
+    category = next((KEYWORD_CATEGORY[word] for word in words if word in KEYWORD_CATEGORY), None)
+    if category is None:
+        category = words[-1].title()
+        confidence = 0.6
+    if len(words) > 6:
+        # Long descriptive queries benefit from the LLM rephrase
+        confidence = min(confidence, 0.7)
+    if re.search(r'\d', text[span[1]:]):
+        # More numbers after the price phrase, e.g. a second constraint
+        confidence = min(confidence, 0.7)
+
+    details = QueryDetails(
+        rephrased_query=' '.join(words),
+        category=category,
+        maximum_price=max_price,
+        minimum_price=min_price,
+    )
+    return details, confidence
@@ -0,0 +1,247 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+from embeddings import content_key
+
+
+class NotRecorded(KeyError):
+    """Raised in replay mode for a request the cassette has no recording of."""
+
+
+def request_key(payload: Any) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded HTTP responses, LLM completions and embeddings in one gzipped JSON file.
+
+    In 'record' mode every lookup miss is filled from the live backend and
+    kept; in 'replay' mode a miss raises NotRecorded, so a replayed run never
+    touches the network.
+
+    Args:
+        path (str): Cassette file, conventionally '*.json.gz'
+        mode (str): 'record' or 'replay'
+    """
+
+    KINDS = ("http", "llm", "embeddings")
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.entries: Dict[str, Dict[str, Any]] = {kind: {} for kind in self.KINDS}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with gzip.open(path, 'rt') as f:
+                self.entries.update(json.load(f))
+        elif mode == "replay":
+            raise FileNotFoundError(f"No cassette at {path}, record one first")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def get(self, kind: str, key: str) -> Any:
+        with self._lock:
+            if key in self.entries[kind]:
+                return self.entries[kind][key]
+        if not self.recording:
+            raise NotRecorded(f"{kind} request {key} is not in {self.path}")
+        return None
+
+    def put(self, kind: str, key: str, value: Any):
+        with self._lock:
+            self.entries[kind][key] = value
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with self._lock, gzip.open(tmp_path, 'wt') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def http_key(request: httpx.Request) -> str:
+    # Headers are left out: the scheduler rotates them on every request
+    params = sorted(request.url.params.multi_items())
+    return request_key([request.method, str(request.url.copy_with(query=None)), params])
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport answering from a cassette, recording through `inner` (a live transport by default)."""
+
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = http_key(request)
+        recorded = self.cassette.get("http", key)
+        if recorded is None:
+            if self.inner is None:
+                self.inner = httpx.AsyncHTTPTransport()
+            response = await self.inner.handle_async_request(request)
+            body = await response.aread()
+            recorded = {"status": response.status_code,
+                        "content_type": response.headers.get("content-type", "text/html"),
+                        "body": base64.b64encode(body).decode()}
+            # Captchas and throttling aren't worth replaying
+            if response.status_code == 200:
+                self.cassette.put("http", key, recorded)
+        return httpx.Response(recorded["status"], headers={"content-type": recorded["content_type"]},
+                              content=base64.b64decode(recorded["body"]), request=request)
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+class OfflineChatModel(BaseChatModel):
+    """
+    Chat model answering without a provider, for offline recording and load tests.
+
+    The query prompts are answered with the rule-based extractor's reading of
+    the query, which is taken to be a shopping query: the classify prompt with
+    'True', the extract prompt with its JSON, and a bound tool is called with
+    the arguments its schema names (is_shopping, the query details or the
+    query itself). After a tool result it answers with that result.
+
+    Attributes:
+        latency (float): Seconds every reply is delayed by, standing in for the provider round trip
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def with_structured_output(self, schema, *, method: Optional[str] = None, **kwargs):
+        # Structured output always goes through tool calling here, which is what tools.py asks for
+        return super().with_structured_output(schema, **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> BaseMessage:
+        from query_parser import extract_query_details
+
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"Here are the top 5 products: {str(last.content)[:200]}")
+        prompt = str(last.content)
+        query = prompt.rsplit("Query:", 1)[-1].split("Response:")[0].strip()
+        details, _ = extract_query_details(query)
+        fields = details.model_dump() if details is not None else {
+            "rephrased_query": query, "category": "", "maximum_price": None, "minimum_price": None}
+        if kwargs.get("tools"):
+            function = kwargs["tools"][0]["function"]
+            values = dict(fields, is_shopping=True, query=query)
+            args = {name: values[name] for name in function["parameters"].get("properties", {}) if name in values}
+            return AIMessage(content="", tool_calls=[{"name": function["name"], "args": args,
+                                                      "id": request_key([query, len(messages)])[:12]}])
+        if prompt.startswith("Return True"):
+            return AIMessage(content="True")
+        return AIMessage(content=json.dumps(fields))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages, stop, **kwargs))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages, stop, **kwargs))])
+
+
+class ReplayChatModel(OfflineChatModel):
+    """
+    Chat model answering from a cassette, keyed on the messages and bound tools.
+    Recording goes through `inner`, e.g. the production ChatOpenAI or an OfflineChatModel.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    cassette: Cassette
+    inner: Optional[BaseChatModel] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, **kwargs):
+        # Recording binds the way the live model does (e.g. ChatOpenAI maps tool_choice 'any' to 'required')
+        if self.inner is not None:
+            return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+        return super().bind_tools(tools, **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> BaseMessage:
+        # Keyed on the tool names only, the rest of the bound kwargs differs between live and replayed models
+        tools = [tool["function"]["name"] for tool in kwargs.get("tools", [])]
+        key = request_key([[message.type, message.content] for message in messages] + [stop, tools])
+        recorded = self.cassette.get("llm", key)
+        if recorded is None:
+            result = self.inner._generate(messages, stop=stop, **kwargs)
+            recorded = message_to_dict(result.generations[0].message)
+            self.cassette.put("llm", key, recorded)
+        return messages_from_dict([recorded])[0]
+
+
+class ReplayEmbeddings:
+    """Embedding provider answering from a cassette, recording misses through `inner` (e.g. OpenAIEmbeddings)."""
+
+    def __init__(self, cassette: Cassette, inner=None):
+        self.cassette = cassette
+        self.inner = inner
+
+    def __call__(self, texts: List[str], model: str) -> List[List[float]]:
+        keys = [content_key(text, model) for text in texts]
+        vectors = [self.cassette.get("embeddings", key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fetched = self.inner([texts[i] for i in missing], model)
+            for i, vector in zip(missing, fetched):
+                vectors[i] = list(vector)
+                self.cassette.put("embeddings", keys[i], vectors[i])
+        return vectors
+
+
+def use_cassette(cassette: Cassette, llm=None, embeddings=None, transport: Optional[httpx.AsyncBaseTransport] = None):
+    """
+    Point the search pipeline in tools at the cassette: Amazon fetches, the query
+    chains and product embeddings. Caches and the catalog are left alone.
+
+    When recording, misses go to `llm`, `embeddings` and `transport`: the
+    production ChatOpenAI, OpenAIEmbeddings and a live HTTP transport by default.
+    """
+    import tools
+    from amazon_scrapper.fetcher import configure_fetcher
+    from embeddings import EmbeddingStore, OpenAIEmbeddings
+
+    configure_fetcher(transport=ReplayTransport(cassette, transport))
+    if cassette.recording:
+        llm = llm or tools.get_llm()
+        embeddings = embeddings or OpenAIEmbeddings()
+    tools.set_llm(ReplayChatModel(cassette=cassette, inner=llm if cassette.recording else None))
+    provider = ReplayEmbeddings(cassette, embeddings if cassette.recording else None)
+    tools.embedding_store = EmbeddingStore(provider, model=tools.embedding_store.model)
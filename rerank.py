@@ -0,0 +1,201 @@
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from products import ProductBatch
+
+
+class RerankWeights(BaseModel):
+    semantic: float = Field(default=1.0, description="Weight of the query/product cosine similarity.")
+    rating: float = Field(default=0.0, description="Weight of the star rating, scaled to 0-1.")
+    reviews: float = Field(default=0.0, description="Weight of the log review count, scaled to 0-1 within the pool.")
+    prime: float = Field(default=0.0, description="Bonus for Prime eligible products.")
+    bestseller: float = Field(default=0.0, description="Bonus for Bestseller or Amazon's Choice products.")
+    price_fit: float = Field(default=0.0, description="Weight of how well the price fits the requested range.")
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_scores(query_embedding: np.ndarray, product_embeddings: np.ndarray) -> np.ndarray:
+    """Cosine similarity of one query vector against every product row, as a single matmul."""
+    return normalize_rows(product_embeddings) @ normalize_rows(query_embedding)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, selected in O(n) with argpartition."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def price_fit(prices: np.ndarray, min_price=None, max_price=None) -> np.ndarray:
+    """1 inside the requested range, decaying linearly with the relative distance outside it."""
+    fit = np.ones(len(prices), dtype=np.float32)
+    if min_price:
+        below = prices < min_price
+        fit[below] = np.clip(1 - (min_price - prices[below]) / min_price, 0, 1)
+    if max_price:
+        above = prices > max_price
+        fit[above] = np.clip(1 - (prices[above] - max_price) / max_price, 0, 1)
+    return fit
+
+
+def blended_scores(similarities: np.ndarray, products: Union[List[Dict], ProductBatch], weights: RerankWeights,
+                   min_price=None, max_price=None, reviews_scale: Optional[float] = None) -> np.ndarray:
+    """
+    Mix semantic similarity with rating, review count, badges and price fit.
+
+    Log review counts are scaled by the largest in the pool, or by log1p(reviews_scale)
+    when given so that scores stay comparable across separately scored batches.
+    """
+    if not isinstance(products, ProductBatch):
+        products = ProductBatch.from_dicts(products)
+    scores = weights.semantic * similarities
+    if weights.rating:
+        scores = scores + weights.rating * products.rating / 5
+    if weights.reviews:
+        reviews = np.log1p(products.reviews.astype(np.float32))
+        scale = np.log1p(reviews_scale) if reviews_scale else reviews.max()
+        if scale > 0:
+            reviews /= scale
+        scores = scores + weights.reviews * reviews
+    if weights.prime:
+        scores = scores + weights.prime * products.is_prime
+    if weights.bestseller:
+        scores = scores + weights.bestseller * (products.is_best_seller | products.is_amazon_choice)
+    if weights.price_fit:
+        scores = scores + weights.price_fit * price_fit(products.price.astype(np.float32), min_price, max_price)
+    return scores
+
+
+def rerank(query_embedding: np.ndarray, product_embeddings: np.ndarray, products: Union[List[Dict], ProductBatch],
+           k: int = 5, weights: Optional[RerankWeights] = None, min_price=None,
+           max_price=None) -> Union[List[Dict], ProductBatch]:
+    """
+    Return the k best products for the query, best first.
+
+    Args:
+        query_embedding (np.ndarray): Query vector
+        product_embeddings (np.ndarray): One row per product
+        products (List[Dict] | ProductBatch): Products in the same order as the embedding rows
+        k (int): Number of products to return
+        weights (RerankWeights): Score blend, pure semantic similarity by default
+        min_price : Minimum price in INR, used by the price fit term
+        max_price : Maximum price in INR, used by the price fit term
+
+    Returns:
+        List[Dict] | ProductBatch: Top k products, in the container type they were given in
+    """
+    if not len(products):
+        return products[:0]
+    scores = cosine_scores(query_embedding, product_embeddings)
+    if weights is not None:
+        scores = blended_scores(scores, products, weights, min_price, max_price)
+    order = top_k_indices(scores, k)
+    if isinstance(products, ProductBatch):
+        return products[order]
+    return [products[i] for i in order]
+
+
+class StreamingReranker:
+    """
+    Running top-k over products that arrive in batches.
+
+    Each batch is scored on its own and merged into a min-heap of the k best
+    products so far; ties keep the product that arrived first, as rerank()
+    does. Review counts are scaled by a fixed `reviews_scale` instead of the
+    pool maximum, which isn't known until the last batch.
+
+    Args:
+        query_embedding (np.ndarray): Query vector
+        k (int): Number of products to keep
+        weights (RerankWeights): Score blend, pure semantic similarity by default
+        min_price : Minimum price in INR, used by the price fit term
+        max_price : Maximum price in INR, used by the price fit term
+        reviews_scale (float): Review count that scores as 1 on the reviews term
+    """
+
+    def __init__(self, query_embedding: np.ndarray, k: int = 5, weights: Optional[RerankWeights] = None,
+                 min_price=None, max_price=None, reviews_scale: float = 100_000):
+        self.query_embedding = query_embedding
+        self.k = k
+        self.weights = weights
+        self.min_price = min_price
+        self.max_price = max_price
+        self.reviews_scale = reviews_scale
+        self.seen = 0
+        self._heap: list = []
+        self._order = itertools.count()
+
+    def add(self, product_embeddings: np.ndarray, batch: ProductBatch) -> bool:
+        """Score a batch and merge it into the running top k; return whether the top k changed."""
+        if not len(batch):
+            return False
+        self.seen += len(batch)
+        scores = cosine_scores(self.query_embedding, product_embeddings)
+        if self.weights is not None:
+            scores = blended_scores(scores, batch, self.weights, self.min_price, self.max_price,
+                                    reviews_scale=self.reviews_scale)
+        changed = False
+        for i in top_k_indices(scores, self.k):
+            entry = (float(scores[i]), -next(self._order), batch[int(i)])
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+                changed = True
+            elif entry[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, entry)
+                changed = True
+        return changed
+
+    def top(self) -> List[Dict]:
+        """The k best products so far, best first."""
+        return [product.to_dict() for _, _, product in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def benchmark_rerank(sizes=(5, 50, 500, 5000), dim: int = 1536, k: int = 5, repeat: int = 20) -> Dict[int, Dict[str, float]]:
+    """Mean time in milliseconds of the per-item sklearn loop and of the vectorized rerank per pool size."""
+    try:
+        from sklearn.metrics.pairwise import cosine_similarity
+    except ImportError:
+        cosine_similarity = None
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in sizes:
+        query = rng.standard_normal(dim).astype(np.float32)
+        matrix = rng.standard_normal((size, dim)).astype(np.float32)
+        timings = {}
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            top_k_indices(cosine_scores(query, matrix), k)
+        timings['vectorized'] = (time.perf_counter() - start) * 1000 / repeat
+
+        if cosine_similarity is not None:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                similarities = [cosine_similarity([query], [row])[0][0] for row in matrix]
+                np.argsort(similarities)[-k:][::-1]
+            timings['sklearn_loop'] = (time.perf_counter() - start) * 1000 / repeat
+
+        results[size] = timings
+    return results
+
+
+if __name__ == "__main__":
+    for size, timings in benchmark_rerank().items():
+        print(size, "  ".join(f"{name}: {ms:.3f} ms" for name, ms in timings.items()))
@@ -0,0 +1,61 @@
+import time
+import uuid
+from typing import AsyncIterator
+
+from tracing import incr, observe
+
+PROMPT = "Provide users with link of the product with detailed report for each of the top 5 products found based on the query:{query}"
+
+
+def format_provisional(products: list) -> str:
+    """Short list of the provisional top products, shown while the search is still refining them."""
+    lines = [f"{i}. {p['title'][:80]} - {p['currency']}{p['price']} ({p['rating']}/5, {p['reviews']} reviews)"
+             for i, p in enumerate(products, 1)]
+    return "Early results, still refining:\n" + "\n".join(lines)
+
+
+def session_thread_id(request) -> str:
+    """Checkpointer thread id for a Gradio session, so every browser session keeps its own conversation."""
+    session_hash = getattr(request, "session_hash", None)
+    return session_hash or uuid.uuid4().hex
+
+
+async def stream_reply(graph, query: str, thread_id: str) -> AsyncIterator[str]:
+    """
+    Run one user turn through the agent and yield progress messages, then the final report.
+
+    Args:
+        graph: Compiled agent graph
+        query (str): User message
+        thread_id (str): Conversation id passed to the checkpointer
+
+    Yields:
+        str: Text to show in the chat window, each replacing the previous one
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    inputs = {"messages": [("user", PROMPT.format(query=query))]}
+
+    # Timed by hand rather than with tracing.span: the span context can't be held
+    # across yields, the consumer may resume this generator from another task.
+    start = time.perf_counter()
+    try:
+        async for mode, update in graph.astream(inputs, config=config, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                # Provisional top 5 written by the search tool while later pages are still coming in
+                if update.get("provisional_products"):
+                    yield format_provisional(update["provisional_products"])
+                continue
+            for node, payload in update.items():
+                for message in (payload or {}).get("messages", []):
+                    if node == "agent" and getattr(message, "tool_calls", None):
+                        searches = ", ".join(str(call["args"].get("query", "")) for call in message.tool_calls)
+                        yield f"Searching Amazon for {searches}..."
+                    elif node == "tools":
+                        yield "Ranking products and writing the report..."
+                    elif node == "agent" and message.content:
+                        yield str(message.content)
+    except Exception:
+        incr("shoppin_stage_errors_total", stage="agent")
+        raise
+    finally:
+        observe("shoppin_stage_duration_seconds", time.perf_counter() - start, stage="agent")
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+def import_times(modules: List[str]) -> List[Tuple[str, float, int]]:
+    """
+    Import modules in a fresh interpreter under `python -X importtime` and sum
+    the self time of every imported module by top-level package. Modules that
+    aren't installed are reported and skipped.
+
+    Returns:
+        List[Tuple[str, float, int]]: (package, seconds, modules imported), slowest first
+    """
+    script = (f"for module in {modules!r}:\n"
+              "    try:\n"
+              "        __import__(module)\n"
+              "    except ImportError as e:\n"
+              "        print(f'skipped {module}: {e}')\n")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        print(line, file=sys.stderr)
+    seconds: Dict[str, float] = defaultdict(float)
+    counts: Dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        seconds[package] += int(self_us) / 1e6
+        counts[package] += 1
+    return sorted(((package, seconds[package], counts[package]) for package in seconds),
+                  key=lambda row: row[1], reverse=True)
+
+
+def profile_startup(modules: Tuple[str, ...] = ("gradio", "main"), top: int = 15):
+    """Print the import-time breakdown of a worker's startup, then time building the agent and warming up."""
+    rows = import_times(list(modules))
+    print(f"Import time by package (python -X importtime -c 'import {', '.join(modules)}'):")
+    print(f"  {'package':<28}{'ms':>10}{'modules':>10}")
+    for package, seconds, count in rows[:top]:
+        print(f"  {package:<28}{seconds * 1000:>10.1f}{count:>10}")
+    print(f"  {'total':<28}{sum(row[1] for row in rows) * 1000:>10.1f}{sum(row[2] for row in rows):>10}")
+
+    import main
+    import tools
+
+    for stage, run in (("build agent", main.get_graph), ("warm up", tools.warm_up)):
+        start = time.perf_counter()
+        try:
+            run()
+        except Exception as e:
+            print(f"{stage}: failed ({e})")
+            continue
+        print(f"{stage}: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,16 +1,20 @@
-from openai import OpenAI
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_openai import ChatOpenAI
-from pydantic import BaseModel, Field
-from langgraph.prebuilt import create_react_agent
+from langchain_core.prompts import PromptTemplate
 from langchain_core.tools import tool
-from langgraph.checkpoint.memory import MemorySaver
-from typing import Union, Literal
-import json, os
-from amazon_scrapper.scrapper import scrape_amazon_india
+from langgraph.config import get_stream_writer
+from typing import Iterator, List, Optional, Tuple, Union
+import asyncio, json, logging, os, threading, time
+from amazon_scrapper.fetcher import get_fetcher, iter_sync, run_sync
+from cache import TTLCache, normalize_query, search_cache_key
+from catalog import ProductCatalog
+from embeddings import EmbeddingStore, OpenAIEmbeddings
+from filters import ProductFilters, filter_products
+from marketplaces import enabled_marketplaces, search_marketplaces, stream_marketplaces
+from products import ProductBatch
+from rerank import RerankWeights, StreamingReranker, rerank
+from query_parser import FAST_PATH_CONFIDENCE, QueryDetails, ShoppingQuery, extract_query_details, record_path
+from tracing import incr, span
+
+logger = logging.getLogger(__name__)
 
 
 def extract_content(query: str):
@@ -37,13 +41,6 @@ def extract_content(query: str):
     else:
         return None
 
-class QueryDetails(BaseModel):
-    rephrased_query: str = Field(description="The rephrased version of the original query.")
-    category: str = Field(description="The category inferred from the query.")
-    maximum_price: Union[int, None] = Field(default=None, description="The maximum price inferred from the query.")
-    minimum_price: Union[int, None] = Field(default=None, description="The minimum price inferred from the query.")
-
-
 prompt = PromptTemplate(
     input_variables=["query"],
     template="Return True if it could be a query for regarding a product on ecommerce platform else False.: {query}"
@@ -62,106 +59,384 @@ prompt_v2= PromptTemplate(
     )
 )
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key=os["OPENAI_API_KEY"])
-#chain = LLMChain(prompt=prompt, llm=llm)
-def is_online_shopping(query: str) -> bool:
-    chain = LLMChain(prompt=prompt, llm=llm)
-    result = chain.invoke(query)
-    
-    if result.strip().lower() == "true":
-      return True
-    else:
-      return False
+prompt_v3 = PromptTemplate(
+    input_variables=["query"],
+    template=(
+        "Given the following query for indian context, decide whether it could be a query regarding a product "
+        "on an ecommerce platform and extract:\n"
+        "- is_shopping: True if it could be a query regarding a product on ecommerce platform else False.\n"
+        "- rephrased_query: A rephrased version of the optimal query to be used on shopping platform.\n"
+        "- category: The category inferred from the query.\n"
+        "- maximum_price: The maximum price inferred from the query.\n"
+        "- minimum_price: The minimum price inferred from the query.\n\n"
+        "Query: {query}"
+    )
+)
+
+# The chat model and the chains on it are built on first use by get_llm(), or replaced with set_llm()
+llm = classify_chain = extract_chain = structured_chain = None
+_llm_lock = threading.Lock()
+
+
+def set_llm(model):
+    """Build the query chains on a chat model; they are built once and shared by every call."""
+    global llm, classify_chain, extract_chain, structured_chain
+    classify_chain = prompt | model
+    extract_chain = prompt_v2 | model
+    structured_chain = prompt_v3 | model.with_structured_output(ShoppingQuery, method="function_calling")
+    llm = model
+
+
+def get_llm():
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                from langchain_openai import ChatOpenAI
+                set_llm(ChatOpenAI(model="gpt-4o", temperature=0, api_key=os.getenv("OPENAI_API_KEY")))
+    return llm
+
+# Set SHOPPIN_SEPARATE_LLM_CALLS=1 to classify and extract with the two original
+# prompts, run concurrently, instead of one structured-output call
+SEPARATE_LLM_CALLS = os.getenv("SHOPPIN_SEPARATE_LLM_CALLS", "0") == "1"
+
+
+async def _timed(stage: str, coro):
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            return await coro
+    finally:
+        record_path(stage, time.perf_counter() - start)
+
+
+async def _classify_and_extract(query: str):
+    """Run the classification and extraction chains concurrently."""
+    get_llm()
+    classification, extraction = await asyncio.gather(
+        _timed("classify", classify_chain.ainvoke({"query": query})),
+        _timed("extract", extract_chain.ainvoke({"query": query})),
+    )
+    is_shopping = classification.content.strip().lower() == "true"
+    data = extract_content(extraction.content)
+    try:
+        details = QueryDetails.model_validate(json.loads(data)).model_dump()
+    except Exception:
+        details = None
+    return is_shopping, details
+
+# Scraped results keyed on (rephrased_query, min_price, max_price, pages fetched) and parsed
+# query details keyed on the normalized user query. Set SHOPPIN_CACHE_PATH to keep
+# both in SQLite across restarts.
+CACHE_PATH = os.getenv("SHOPPIN_CACHE_PATH")
+search_cache = TTLCache(maxsize=512, ttl=float(os.getenv("SHOPPIN_SEARCH_TTL", 30 * 60)),
+                        stale_ttl=float(os.getenv("SHOPPIN_SEARCH_STALE_TTL", 6 * 60 * 60)),
+                        disk_path=CACHE_PATH, name="search")
+query_cache = TTLCache(maxsize=2048, ttl=24 * 60 * 60, disk_path=CACHE_PATH, name="query")
+
 
 def process_query(query: str) -> Union[dict, bool]:
     """Use this tool extract an evaluate the if the query is related to shopping of a product. And check if it complete or further information is required."""
-  
-    if not is_online_shopping:
-      raise AssertionError("Query Not related to onlline shopping. Appologies to user")
-    #prompt= prompt_v2
-    chain = LLMChain(prompt=prompt_v2, llm=llm)
-    response = chain.invoke(query)
-    data = extract_content(response["text"])
-    #print(response.startswith("{"))
+    with span("process_query"):
+        return query_cache.get_or_fetch(normalize_query(query), lambda: _process_query(query))
+
+
+def _process_query(query: str) -> Union[dict, bool]:
+    # Plain price phrasing ("phone under 20000") is parsed without an LLM round trip
+    start = time.perf_counter()
+    details, confidence = extract_query_details(query)
+    if details is not None and confidence >= FAST_PATH_CONFIDENCE:
+        record_path("fast", time.perf_counter() - start)
+        incr("shoppin_query_path_total", path="fast")
+        return details.model_dump()
+
+    start = time.perf_counter()
+    incr("shoppin_query_path_total", path="llm")
     try:
-        # If the response is a JSON string, use model_validate_json
-        details = json.loads(data)
-        #print(details)
-        # Check if price information is present
-        if details["maximum_price"] is not None:
-            return details
-        elif details["minimum_price"] is not None:
-            return details
-        else:
-            raise AssertionError("Ask from the user for the price.")
-    except Exception as e:
+        return _llm_process_query(query)
+    finally:
+        record_path("llm", time.perf_counter() - start)
+
+
+def _llm_process_query(query: str) -> Union[dict, bool]:
+    get_llm()
+    if SEPARATE_LLM_CALLS:
+        is_shopping, details = run_sync(_classify_and_extract(query))
+    else:
+        start = time.perf_counter()
+        try:
+            with span("structured"):
+                result = structured_chain.invoke({"query": query})
+        finally:
+            record_path("structured", time.perf_counter() - start)
+        is_shopping = result.is_shopping
+        details = result.model_dump(exclude={"is_shopping"})
+
+    if not is_shopping:
+        raise AssertionError("Query Not related to onlline shopping. Appologies to user")
+    if details is None:
         raise AssertionError("Please provide the correct query")
+    # Check if price information is present
+    if details["maximum_price"] is None and details["minimum_price"] is None:
+        raise AssertionError("Ask from the user for the price.")
+    return details
+
+# Set SHOPPIN_EMBEDDING_PATH to keep embeddings on disk across restarts; the OpenAI client is created on first use
+embedding_store = EmbeddingStore(OpenAIEmbeddings(), path=os.getenv("SHOPPIN_EMBEDDING_PATH"),
+                                 model="text-embedding-3-small")
+
+# Every scrape is upserted into the local catalog, and queries with at least
+# CATALOG_MIN_RESULTS fresh catalog matches are answered without a network fetch.
+# Set SHOPPIN_CATALOG_PATH to keep the catalog on disk.
+catalog = ProductCatalog(os.getenv("SHOPPIN_CATALOG_PATH"))
+CATALOG_MAX_AGE = float(os.getenv("SHOPPIN_CATALOG_MAX_AGE", 24 * 60 * 60))
+CATALOG_MIN_RESULTS = int(os.getenv("SHOPPIN_CATALOG_MIN_RESULTS", 5))
+
+# Pure semantic ranking; raise the other weights to favour well rated, Prime or in-budget products
+RERANK_WEIGHTS = RerankWeights()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os["OPENAI_API_KEY"])
+# Only the price range filters by default; set these to also drop poorly rated, unreviewed or non-Prime products
+PRODUCT_FILTERS = ProductFilters()
+
+
+# Result pages fetched per search and marketplace, 5 candidates each; with more than one, streaming
+# shows a provisional top 5 from the first page while the others are still loading
+SEARCH_PAGES = int(os.getenv("SHOPPIN_SEARCH_PAGES", 1))
+
+# Seconds top_5_products waits for the marketplaces. Batch runs queue behind the rate limit and captcha
+# cooldowns, so by default they wait for every marketplace rather than the interactive SHOPPIN_SEARCH_DEADLINE.
+BATCH_SEARCH_DEADLINE = float(os.getenv("SHOPPIN_BATCH_SEARCH_DEADLINE", "inf"))
+
+# Scraped products are filtered, embedded and merged into the running top 5 this many at a time when streaming
+STREAM_BATCH_SIZE = int(os.getenv("SHOPPIN_STREAM_BATCH_SIZE", 4))
+
+
+def _stream_writer():
+    """The agent run's custom stream writer, or a no-op when the tool is called outside the graph."""
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        return lambda chunk: None
 
 
 @tool
 def get_top_5_products(query:str)->list:
-    """Use this tool extract an evaluate if the query is related to shopping of a product. And check if it complete or further information is required. Then return top 5 products available on amazon according to the query."""
+    """Use this tool extract an evaluate if the query is related to shopping of a product. And check if it complete or further information is required. Then return top 5 products available on amazon and the other enabled marketplaces according to the query."""
+    with span("get_top_5_products") as tool_span:
+        write = _stream_writer()
+        top_5 = []
+        for top_5 in stream_top_5_products(query):
+            write({"provisional_products": top_5})
+        tool_span.set(products=len(top_5))
+        return top_5
 
-    
-    details = process_query(query)
-    print(details)
-    max_price = details["maximum_price"]
-    min_price = details["minimum_price"]
-    products = scrape_amazon_india(
-        search_query=details["rephrased_query"],
+
+def _scrape(search_query: str, min_price, max_price, deadline: Optional[float] = None) -> Tuple[list, List[str]]:
+    """
+    Search every enabled marketplace concurrently, up to `deadline` seconds
+    (SHOPPIN_SEARCH_DEADLINE by default). Returns the products and the
+    marketplaces that failed or were cut off; only complete searches are
+    upserted into the catalog.
+    """
+    products, missing = search_marketplaces(
+        search_query=search_query,
         min_price=min_price,
         max_price=max_price,
-        n=5
+        n=5 * SEARCH_PAGES,
+        pages=SEARCH_PAGES,
+        deadline=deadline,
     )
+    if not missing:
+        catalog.upsert(products)
+    return products, missing
+
+
+def _refresh_scrape(search_query: str, min_price, max_price) -> list:
+    # Background refresh of a stale search cache entry; an incomplete search comes back
+    # empty, which the cache doesn't store, so the stale entry is kept
+    products, missing = _scrape(search_query, min_price, max_price)
+    return [] if missing else products
+
+
+def _catalog_products(details: dict) -> list:
+    with span("catalog") as catalog_span:
+        products = catalog.search(details["rephrased_query"], details["minimum_price"], details["maximum_price"],
+                                  limit=20, max_age=CATALOG_MAX_AGE, embedding_store=embedding_store)
+        catalog_span.set(products=len(products))
+    return products
+
 
+def _filter(products: list, min_price, max_price) -> ProductBatch:
+    """Drop out of range and unwanted candidates before paying to embed them."""
+    with span("filter", candidates=len(products)) as filter_span:
+        batch, dropped = filter_products(ProductBatch.from_dicts(products), min_price, max_price, PRODUCT_FILTERS)
+        for name, count in dropped.items():
+            incr("shoppin_filter_dropped_total", count, filter=name)
+        filter_span.set(products=len(batch), **{f"dropped_{name}": count for name, count in dropped.items()})
+    return batch
+
+
+def _embed(texts: list):
+    # Only texts missing from the store are sent to the provider
+    with span("embed", texts=len(texts)) as embed_span:
+        misses = embedding_store.stats["misses"]
+        embeddings = embedding_store.embed(texts)
+        embed_span.set(misses=embedding_store.stats["misses"] - misses)
+    return embeddings
+
+
+def _rank(query: str, products: list, min_price, max_price) -> list:
+    batch = _filter(products, min_price, max_price)
 
-    # Price filtering
-    filtered = []
-    for product in products:
-        price = product['price']
-        if (min_price is None or price >= min_price) and (max_price is None or price <= max_price):
-            filtered.append(product)
-        elif min_price is None or price >= min_price:
-            filtered.append(product) 
-        elif max_price is None or price <= max_price:
-            filtered.append(product)
-    
     # Exit early if no products found
-    if not filtered:
+    if not len(batch):
         return []
-    
-    # Prepare product texts for embedding
-    product_texts = [
-        f"{p['title']} | {p['price']} | Rating: {p['rating']} | Reviews: {p['reviews']}"
-        for p in filtered
-    ]
-    
-    # Generate embeddings
-    product_embeddings = client.embeddings.create(
-        input=product_texts,
-        model="text-embedding-3-small"
-    ).data
-    
-    query_embedding = client.embeddings.create(
-        input=[query],
-        model="text-embedding-3-small"
-    ).data[0].embedding
-    
-    # Calculate similarities
-    similarities = []
-    for emb in product_embeddings:
-        similarities.append(cosine_similarity(
-            [query_embedding],
-            [emb.embedding]
-        )[0][0])
-    
-    # Get top 5 indicess
-    top_indices = np.argsort(similarities)[-5:][::-1]
-    
-    return [filtered[i] for i in top_indices[:5]]  # Strict top 5
+
+    # Generate embeddings for the query and products in one batch
+    embeddings = _embed([query] + batch.texts())
+    query_embedding = embeddings[0]
+    product_embeddings = embeddings[1:]
+
+    with span("rerank", candidates=len(batch)):
+        top_5 = rerank(query_embedding, product_embeddings, batch, k=5, weights=RERANK_WEIGHTS,
+                       min_price=min_price, max_price=max_price)  # Strict top 5
+    return top_5.to_dicts()
+
+
+def top_5_products(query: str) -> list:
+    """
+    Search, filter and rerank products for a query without the agent loop (used by batch mode).
+
+    Raises:
+        RuntimeError: A marketplace failed, was blocked or missed BATCH_SEARCH_DEADLINE,
+            so the answer would be incomplete
+    """
+    details = process_query(query)
+    logger.debug("Query details: %s", details)
+    max_price = details["maximum_price"]
+    min_price = details["minimum_price"]
+    products = _catalog_products(details)
+
+    if len(products) < CATALOG_MIN_RESULTS:
+        with span("search") as search_span:
+            key = search_cache_key(details["rephrased_query"], min_price, max_price, SEARCH_PAGES)
+            products, fill = search_cache.lookup(
+                key, lambda: _refresh_scrape(details["rephrased_query"], min_price, max_price)
+            )
+            if fill is not None:
+                try:
+                    products, missing = _scrape(details["rephrased_query"], min_price, max_price,
+                                                deadline=BATCH_SEARCH_DEADLINE)
+                    if missing:
+                        raise RuntimeError(f"Incomplete search, no results from {', '.join(missing)}")
+                except BaseException as e:
+                    search_cache.complete(key, fill, error=e)
+                    raise
+                search_cache.complete(key, fill, products)
+            search_span.set(products=len(products))
+
+    return _rank(query, products, min_price, max_price)
+
+
+def _stream_search(query: str, search_query: str, min_price, max_price, scraped: list,
+                   missing: list) -> Iterator[list]:
+    """
+    Stream a scrape into a running top 5, yielding it whenever it changes. Products are
+    appended to `scraped` and marketplaces that failed or missed the deadline to `missing`.
+    """
+    # The marketplaces are searched on the fetcher loop while the query is embedded here
+    stream = iter_sync(stream_marketplaces(search_query, min_price, max_price,
+                                           n=5 * SEARCH_PAGES, pages=SEARCH_PAGES, missing=missing))
+    ranker = StreamingReranker(_embed([query])[0], k=5, weights=RERANK_WEIGHTS,
+                               min_price=min_price, max_price=max_price)
+    pending = []
+    changed = False
+
+    def merge_pending() -> bool:
+        batch = _filter(pending, min_price, max_price)
+        pending.clear()
+        if not len(batch):
+            return False
+        product_embeddings = _embed(batch.texts())
+        with span("rerank", candidates=len(batch)):
+            return ranker.add(product_embeddings, batch)
+
+    with span("search") as search_span:
+        for product in stream:
+            scraped.append(product)
+            pending.append(product)
+            if len(pending) >= STREAM_BATCH_SIZE and merge_pending():
+                changed = False
+                yield ranker.top()
+        if pending:
+            changed = merge_pending()
+        search_span.set(products=len(scraped), streamed=True)
+
+    if changed or not ranker.seen:
+        yield ranker.top()
+
+
+def stream_top_5_products(query: str) -> Iterator[list]:
+    """
+    Like top_5_products, but yield a provisional top 5 as soon as the first
+    few scraped products are ranked and a refined one whenever a later batch
+    changes it. The last list yielded is the final answer.
+
+    Catalog and search cache hits (stale ones are refreshed in the background)
+    are already complete and are ranked and yielded once, as is the scrape of
+    a concurrent identical query, which is waited for rather than repeated.
+    A streamed scrape is stored in both when it finishes before the search deadline.
+    """
+    details = process_query(query)
+    logger.debug("Query details: %s", details)
+    max_price = details["maximum_price"]
+    min_price = details["minimum_price"]
+    products = _catalog_products(details)
+    key = search_cache_key(details["rephrased_query"], min_price, max_price, SEARCH_PAGES)
+    fill = None
+    if len(products) < CATALOG_MIN_RESULTS:
+        products, fill = search_cache.lookup(
+            key, lambda: _refresh_scrape(details["rephrased_query"], min_price, max_price)
+        )
+    if fill is None:
+        yield _rank(query, products or [], min_price, max_price)
+        return
+
+    # This call owns the scrape until it completes the fill
+    scraped, missing = [], []
+    try:
+        yield from _stream_search(query, details["rephrased_query"], min_price, max_price, scraped, missing)
+    except GeneratorExit:
+        # The consumer stopped early: waiters get what was scraped so far, which isn't cached
+        search_cache.complete(key, fill, scraped, store=False)
+        raise
+    except BaseException as e:
+        search_cache.complete(key, fill, error=e)
+        raise
+    # A search cut off by the deadline or missing a blocked marketplace was ranked, but isn't kept for later queries
+    search_cache.complete(key, fill, scraped, store=not missing)
+    if scraped and not missing:
+        catalog.upsert(scraped)
+
+def warm_up():
+    """
+    Build the query chains and open pooled connections to the marketplaces and OpenAI ahead
+    of the first query. Best effort: failures are logged and left to the first
+    real request.
+    """
+    get_llm()
+
+    async def warm_fetcher():
+        fetcher = get_fetcher()
+        await asyncio.gather(*(fetcher.warm(marketplace.base_url) for marketplace in enabled_marketplaces()))
+
+    run_sync(warm_fetcher())
+    for client in (getattr(embedding_store.provider, "client", None), getattr(llm, "root_client", None)):
+        if client is None:
+            continue
+        try:
+            client.models.list()
+        except Exception as e:
+            logger.warning("Could not warm up the OpenAI connection: %s", e)
 
 #Example usage
 #top_5 = get_top_5_products(
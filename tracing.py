@@ -0,0 +1,210 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Tuple
+
+# Upper bounds in seconds, Prometheus client defaults extended for slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTE_BUCKETS = (1_000, 10_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000)
+
+_lock = threading.Lock()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_sink = None
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus exposition format."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Bucket upper bound below which a fraction q of the observations fall."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+# (metric name, sorted label items) -> Histogram, counter or gauge value
+histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+counters: Dict[Tuple[str, Tuple], float] = {}
+gauges: Dict[Tuple[str, Tuple], float] = {}
+
+
+def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels):
+    with _lock:
+        key = _key(name, labels)
+        if key not in histograms:
+            histograms[key] = Histogram(buckets)
+        histograms[key].observe(value)
+
+
+def incr(name: str, value: float = 1, **labels):
+    with _lock:
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+
+def gauge(name: str, value: float, **labels):
+    with _lock:
+        gauges[_key(name, labels)] = value
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent: Optional[str], attrs: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span]:
+    """
+    Time a pipeline stage.
+
+    The duration feeds the 'shoppin_stage_duration_seconds' histogram, failures
+    count towards 'shoppin_stage_errors_total', and a 'bytes' attribute towards
+    'shoppin_payload_bytes'. Finished spans are written to the trace sink if
+    one is configured.
+    """
+    parent = _current_span.get()
+    current = Span(name, parent.trace_id if parent else uuid.uuid4().hex, parent.span_id if parent else None, attrs)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=repr(e))
+        incr("shoppin_stage_errors_total", stage=name)
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        observe("shoppin_stage_duration_seconds", current.duration, stage=name)
+        if "bytes" in current.attrs:
+            observe("shoppin_payload_bytes", current.attrs["bytes"], buckets=BYTE_BUCKETS, stage=name)
+        if _sink is not None:
+            _sink.write(current)
+
+
+class JSONLSink:
+    """Append every finished span as one JSON line."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'a', buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, finished: Span):
+        record = {
+            "trace_id": finished.trace_id,
+            "span_id": finished.span_id,
+            "parent_id": finished.parent,
+            "name": finished.name,
+            "start": finished.start,
+            "duration_ms": round(finished.duration * 1000, 3),
+            **finished.attrs,
+        }
+        with self._lock:
+            self._file.write(json.dumps(record, default=str) + "\n")
+
+
+def set_trace_sink(path: Optional[str]):
+    """Write finished spans to a JSONL file, or stop writing when path is None."""
+    global _sink
+    _sink = JSONLSink(path) if path else None
+
+
+def _format_labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """Render all histograms, counters and gauges in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for (name, labels), histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), value in sorted(counters.items()) + sorted(gauges.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(port: int) -> ThreadingHTTPServer:
+    """Expose render_prometheus() at http://0.0.0.0:<port>/metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def set_scraper_logging(level: Optional[str]):
+    """
+    Turn the scraper's debug output on at the given level ('DEBUG', 'INFO', ...)
+    or off when level is None. It is off unless SHOPPIN_SCRAPER_LOG_LEVEL is set.
+    """
+    logger = logging.getLogger("amazon_scrapper")
+    if level is None:
+        logger.setLevel(logging.CRITICAL + 1)
+        return
+    logger.setLevel(level.upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+
+
+set_scraper_logging(os.getenv("SHOPPIN_SCRAPER_LOG_LEVEL"))
+set_trace_sink(os.getenv("SHOPPIN_TRACE_PATH"))